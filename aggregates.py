@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from datetime import date
+
+from retention import entry_count
+
+ALL = None  # Project key of the all-projects rows
+
+
+def _week_of(day):
+    """ISO week label ("2024-W05") of a "YYYY-MM-DD" date; "" if malformed."""
+    try:
+        year, week, _ = date.fromisoformat(day[:10]).isocalendar()
+    except (TypeError, ValueError):
+        return ""
+    return f"{year}-W{week:02d}"
+
+
+def _empty():
+    return {"duration_seconds": 0, "break_seconds": 0, "earnings": 0.0, "entries": 0}
+
+
+def _add(into, key, duration, breaks, earnings, count):
+    totals = into.get(key)
+    if totals is None:
+        totals = into[key] = _empty()
+    totals["duration_seconds"] += duration
+    totals["break_seconds"] += breaks
+    totals["earnings"] += earnings
+    totals["entries"] += count
+
+
+def _rounded(totals):
+    totals = dict(totals)
+    totals["earnings"] = round(totals["earnings"], 4)
+    return totals
+
+
+class AggregateCache:
+    """Running totals of the history by (project, day) and (project, week).
+
+    Built with one pass over the entries, then kept current by add(), so
+    day and week totals are dict lookups. Rows under the project ALL sum
+    every project. Date-range totals are summed from the per-day rows and
+    the results kept in a small LRU; add() evicts only the cached ranges
+    the new entry falls into. Values are {"duration_seconds",
+    "break_seconds", "earnings", "entries"}.
+    """
+
+    def __init__(self, entries=(), max_ranges=64):
+        self.by_day = {}
+        self.by_week = {}
+        self.max_ranges = max_ranges
+        self._weeks = {}  # "YYYY-MM-DD" -> week label
+        self._ranges = OrderedDict()
+        self.hits = self.misses = 0
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        project = (entry.get("project") or "").strip()
+        day = entry.get("date") or ""
+        week = self._weeks.get(day)
+        if week is None:
+            week = self._weeks[day] = _week_of(day)
+        duration = int(entry.get("duration_seconds") or 0)
+        breaks = int(entry.get("break_seconds") or 0)
+        earnings = float(entry.get("earnings") or 0.0)
+        count = entry_count(entry)
+        for key in ((project, day), (ALL, day)):
+            _add(self.by_day, key, duration, breaks, earnings, count)
+        for key in ((project, week), (ALL, week)):
+            _add(self.by_week, key, duration, breaks, earnings, count)
+        if self._ranges:
+            stale = [
+                key
+                for key in self._ranges
+                if key[0] in (ALL, project)
+                and (key[1] is None or day >= key[1])
+                and (key[2] is None or day <= key[2])
+            ]
+            for key in stale:
+                del self._ranges[key]
+
+    def day(self, day, project=ALL):
+        return _rounded(self.by_day.get((project, day)) or _empty())
+
+    def week(self, week, project=ALL):
+        """Totals for an ISO week label such as "2024-W05"."""
+        return _rounded(self.by_week.get((project, week)) or _empty())
+
+    def range(self, date_from=None, date_to=None, project=ALL):
+        """Totals over an inclusive "YYYY-MM-DD" range (open ends allowed)."""
+        key = (project, date_from, date_to)
+        totals = self._ranges.get(key)
+        if totals is not None:
+            self.hits += 1
+            self._ranges.move_to_end(key)
+            return _rounded(totals)
+        self.misses += 1
+        totals = _empty()
+        for (row_project, day), values in self.by_day.items():
+            if (
+                row_project == project
+                and (date_from is None or day >= date_from)
+                and (date_to is None or day <= date_to)
+            ):
+                for name, value in values.items():
+                    totals[name] += value
+        self._ranges[key] = totals
+        if len(self._ranges) > self.max_ranges:
+            self._ranges.popitem(last=False)
+        return _rounded(totals)
+
+    def projects(self, day=None, week=None):
+        """Per-project totals for one day or week, sorted by project."""
+        rows, label = (self.by_week, week) if week is not None else (self.by_day, day)
+        found = {
+            project: _rounded(values)
+            for (project, key), values in rows.items()
+            if key == label and project is not ALL
+        }
+        return dict(sorted(found.items()))
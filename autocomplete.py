@@ -0,0 +1,96 @@
+import tkinter as tk
+
+# Keys that move through or close the list instead of changing the text
+_NAVIGATION = frozenset(
+    ("Up", "Down", "Return", "KP_Enter", "Escape", "Tab", "ISO_Left_Tab")
+)
+
+
+class Autocomplete:
+    """Suggestion list under an Entry or Combobox, refreshed on each keystroke.
+
+    complete(text, limit) returns the suggestions. Up/Down move through
+    them, Return or a click picks one, and Escape or leaving the field
+    closes the list.
+    """
+
+    def __init__(self, entry, complete, limit=8):
+        self.entry = entry
+        self.complete = complete
+        self.limit = limit
+        self.popup = None
+        self.listbox = None
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", lambda e: self._move(1), add="+")
+        entry.bind("<Up>", lambda e: self._move(-1), add="+")
+        entry.bind("<Return>", self._on_return, add="+")
+        entry.bind("<KP_Enter>", self._on_return, add="+")
+        entry.bind("<Escape>", lambda e: self.hide(), add="+")
+        # Delayed so a click on the list lands before it closes
+        entry.bind("<FocusOut>", lambda e: entry.after(150, self.hide), add="+")
+
+    def _on_key(self, event):
+        if event.keysym in _NAVIGATION:
+            return
+        text = self.entry.get()
+        suggestions = self.complete(text, self.limit) if text.strip() else []
+        if not suggestions or suggestions == [text]:
+            self.hide()
+        else:
+            self._show(suggestions)
+
+    def _show(self, suggestions):
+        if self.popup is None:
+            self.popup = tk.Toplevel(self.entry)
+            self.popup.overrideredirect(True)
+            self.popup.attributes("-topmost", True)
+            self.listbox = tk.Listbox(self.popup, exportselection=False)
+            self.listbox.pack(fill=tk.BOTH, expand=True)
+            self.listbox.bind("<ButtonRelease-1>", self._on_click)
+        self.listbox.delete(0, tk.END)
+        for suggestion in suggestions:
+            self.listbox.insert(tk.END, suggestion)
+        self.listbox.config(height=len(suggestions))
+        self.popup.geometry(
+            f"{self.entry.winfo_width()}x{self.listbox.winfo_reqheight()}"
+            f"+{self.entry.winfo_rootx()}"
+            f"+{self.entry.winfo_rooty() + self.entry.winfo_height()}"
+        )
+        self.popup.deiconify()
+        self.popup.lift()
+
+    def hide(self):
+        if self.popup is not None:
+            self.popup.withdraw()
+
+    def _visible(self):
+        return self.popup is not None and self.popup.winfo_ismapped()
+
+    def _move(self, step):
+        if not self._visible():
+            return None  # Let a Combobox open its own dropdown
+        selection = self.listbox.curselection()
+        index = selection[0] + step if selection else (0 if step > 0 else -1)
+        index %= self.listbox.size()
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return "break"
+
+    def _on_return(self, event):
+        if not self._visible() or not self.listbox.curselection():
+            return None
+        self._accept(self.listbox.get(self.listbox.curselection()[0]))
+        return "break"
+
+    def _on_click(self, event):
+        index = self.listbox.nearest(event.y)
+        if index >= 0:
+            self._accept(self.listbox.get(index))
+
+    def _accept(self, value):
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, value)
+        self.entry.icursor(tk.END)
+        self.entry.focus_set()
+        self.hide()
@@ -0,0 +1,396 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory comes from tracemalloc instead
+    resource = None
+
+from storage import DEFAULT_EXTENSIONS, open_storage
+
+OPERATIONS = ("load", "load_warm", "save", "projects", "startup")
+BACKENDS = ("json", "journal", "sqlite")
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def generate_entries(count, seed=0, projects=25, tasks=400, rate=45.0):
+    """Yield a synthetic history shaped like real use.
+
+    Projects and tasks follow a Zipf-like distribution (a few dominate), about
+    eight sessions are logged per working day, and the history spans at most
+    ten years, so larger counts pack more sessions into each day.
+    """
+    rng = random.Random(seed)
+    project_names = [f"Project {i:02d}" for i in range(projects)]
+    task_names = [f"Task {i:03d}" for i in range(tasks)]
+    project_weights = [1.0 / (i + 1) for i in range(projects)]
+    task_weights = [1.0 / (i + 1) for i in range(tasks)]
+    per_day = max(8, -(-count // 3650))
+    day = date.today() - timedelta(days=-(-count // per_day))
+    produced = 0
+    while produced < count:
+        day += timedelta(days=1)
+        batch = min(per_day, count - produced)
+        day_projects = rng.choices(project_names, project_weights, k=batch)
+        day_tasks = rng.choices(task_names, task_weights, k=batch)
+        clock = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+        for project, task in zip(day_projects, day_tasks):
+            duration = rng.randint(300, 5400)
+            pause = rng.choice((0, 0, 0, 60, 300, 900))
+            start = clock
+            clock = start + timedelta(seconds=duration + pause)
+            yield {
+                "task": task,
+                "project": project,
+                "duration_seconds": duration,
+                "break_seconds": pause,
+                "start_time": start.isoformat(),
+                "end_time": clock.isoformat(),
+                "earnings": round((duration / 3600.0) * rate, 4),
+                "date": day.isoformat(),
+            }
+        produced += batch
+
+
+def history_path(work_dir, size, backend, seed):
+    """Create (once) and return a synthetic data file for size/backend/seed."""
+    path = os.path.join(
+        work_dir, f"history_{size}_{seed}{DEFAULT_EXTENSIONS[backend]}"
+    )
+    if not os.path.exists(path):
+        storage = open_storage(path, backend)
+        try:
+            storage.write_all(generate_entries(size, seed))
+        finally:
+            storage.close()
+    return path
+
+
+def summarize(samples):
+    """Latency statistics in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+def _peak_memory_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    import tracemalloc
+
+    return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+
+
+# -------------------- Worker side (one fresh process per measurement) ------------
+def _scratch_copy(path, args, name):
+    """Copy the cached history into the scratch dir and return the copy's path.
+
+    Workers use the copy, so saves don't change the history in --work-dir and
+    no snapshot is cached next to it.
+    """
+    scratch = os.path.join(args.scratch_dir, name + os.path.splitext(path)[1])
+    shutil.copyfile(path, scratch)
+    return scratch
+
+
+def _bench_load(path, args, warm=False):
+    """Time load_data plus decoding the entries (len(logic.data)).
+
+    Cold runs delete the snapshot first, so they parse the data file and
+    rebuild it; warm runs read the snapshot the previous run left. Works
+    on a copy so no snapshot is cached next to the history in --work-dir.
+    """
+    from snapshot import snapshot_path
+    from tracker_logic import TimeTrackerLogic
+
+    scratch = _scratch_copy(path, args, "load")
+    logic = TimeTrackerLogic(data_file=scratch, autoload=False)
+    if warm:
+        logic.load_data()
+        len(logic.data)
+    samples = []
+    for _ in range(args.repeat):
+        logic.data = []
+        if not warm and os.path.exists(snapshot_path(scratch)):
+            os.remove(snapshot_path(scratch))
+        start = time.perf_counter()
+        logic.load_data()
+        count = len(logic.data)
+        samples.append(time.perf_counter() - start)
+    result = {"latency": summarize(samples), "entries": count}
+    result["entries_per_sec"] = count / min(samples)
+    logic.close()
+    return result
+
+
+def _bench_save(path, args):
+    from tracker_logic import TimeTrackerLogic
+
+    scratch = _scratch_copy(path, args, "save")
+    logic = TimeTrackerLogic(data_file=scratch)
+    logic.set_hourly_rate(45.0)
+    now = datetime.now()
+    samples = []
+    start_all = time.perf_counter()
+    for i in range(args.saves):
+        start = time.perf_counter()
+        logic.save_time_entry(
+            f"Task {i % 40:03d}",
+            f"Project {i % 7:02d}",
+            timedelta(minutes=25),
+            now,
+            now,
+            timedelta(minutes=5),
+        )
+        samples.append(time.perf_counter() - start)
+    # Caller-side latency above; durable throughput includes the writer's flush
+    logic.writer.flush()
+    durable = time.perf_counter() - start_all
+    logic.close()
+    return {
+        "latency": summarize(samples),
+        "durable_saves_per_sec": args.saves / durable,
+    }
+
+
+def _bench_projects(path, args):
+    from tracker_logic import TimeTrackerLogic
+
+    logic = TimeTrackerLogic(data_file=_scratch_copy(path, args, "projects"))
+    samples = []
+    for _ in range(args.repeat * 10):
+        start = time.perf_counter()
+        projects = logic.get_unique_projects()
+        samples.append(time.perf_counter() - start)
+    logic.close()
+    return {"latency": summarize(samples), "projects": len(projects)}
+
+
+def _bench_startup(path, args):
+    path = _scratch_copy(path, args, "startup")
+    # TimeTracker reads ~/.time_tracker_settings.json, so give it its own home
+    home = os.path.join(args.scratch_dir, "home")
+    os.makedirs(home, exist_ok=True)
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    with open(os.path.join(home, ".time_tracker_settings.json"), "w") as f:
+        json.dump({"data_file": path, "hourly_rate": 45.0}, f)
+
+    start = time.perf_counter()
+    import tkinter
+
+    import main
+
+    imported = time.perf_counter()
+    try:
+        app = main.TimeTracker()
+    except tkinter.TclError as e:
+        return {"skipped": f"no display: {e}"}
+    constructed = time.perf_counter()
+    app.root.update()
+    painted = time.perf_counter()
+    app.root.destroy()
+    app.logic.close()
+    return {
+        "import_ms": (imported - start) * 1000,
+        "init_ms": (constructed - imported) * 1000,
+        "first_paint_ms": (painted - start) * 1000,
+    }
+
+
+WORKERS = {
+    "load": _bench_load,
+    "load_warm": lambda path, args: _bench_load(path, args, warm=True),
+    "save": _bench_save,
+    "projects": _bench_projects,
+    "startup": _bench_startup,
+}
+
+
+def run_worker(args):
+    if resource is None:
+        import tracemalloc
+
+        tracemalloc.start()
+    baseline = _peak_memory_mb()
+    result = WORKERS[args.operation](args.path, args)
+    result["peak_rss_mb"] = _peak_memory_mb()
+    result["peak_over_baseline_mb"] = result["peak_rss_mb"] - baseline
+    json.dump(result, sys.stdout)
+
+
+# -------------------- Driver side --------------------
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_suite(args):
+    work_dir = args.work_dir or os.path.join(
+        tempfile.gettempdir(), "time_tracker_bench"
+    )
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            generate_start = time.perf_counter()
+            path = history_path(work_dir, size, backend, args.seed)
+            print(
+                f"{size:>10} {backend:<8} data ready "
+                f"({time.perf_counter() - generate_start:.1f}s)",
+                file=sys.stderr,
+            )
+            for operation in args.operations:
+                with tempfile.TemporaryDirectory() as scratch:
+                    proc = subprocess.run(
+                        [
+                            sys.executable,
+                            os.path.abspath(__file__),
+                            "--worker",
+                            operation,
+                            "--path",
+                            path,
+                            "--scratch-dir",
+                            scratch,
+                            "--repeat",
+                            str(args.repeat),
+                            "--saves",
+                            str(args.saves),
+                        ],
+                        capture_output=True,
+                        text=True,
+                    )
+                record = {"operation": operation, "size": size, "backend": backend}
+                if proc.returncode != 0:
+                    record["error"] = proc.stderr.strip().splitlines()[-1:]
+                else:
+                    record.update(json.loads(proc.stdout))
+                results.append(record)
+                print(f"{'':>10} {'':<8} {_describe(record)}", file=sys.stderr)
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def _headline(record):
+    """The single number used to compare runs: lower is better."""
+    if "latency" in record:
+        return record["latency"]["p50_ms"]
+    return record.get("first_paint_ms")
+
+
+def _describe(record):
+    if "error" in record:
+        return f"{record['operation']}: error {record['error']}"
+    if "skipped" in record:
+        return f"{record['operation']}: skipped ({record['skipped']})"
+    return (
+        f"{record['operation']}: p50 {_headline(record):.3f} ms, "
+        f"peak {record['peak_rss_mb']:.0f} MB"
+    )
+
+
+def compare(baseline, current, threshold):
+    """Print headline ratios against a previous results file; count regressions."""
+    old = {
+        (r["operation"], r["size"], r["backend"]): r for r in baseline["results"]
+    }
+    regressions = 0
+    for record in current["results"]:
+        key = (record["operation"], record["size"], record["backend"])
+        before = old.get(key)
+        if before is None or _headline(before) is None or _headline(record) is None:
+            continue
+        ratio = _headline(record) / max(_headline(before), 1e-9)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key[0]:<9} {key[1]:>10} {key[2]:<8} x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark load, save, project lookup and startup at scale"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument(
+        "--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS)
+    )
+    parser.add_argument(
+        "--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--saves", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="Where generated histories are cached")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Previous results file to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Slowdown ratio reported as a regression (default: 0.25)",
+    )
+    # Internal: run one measurement in this process
+    parser.add_argument("--worker", choices=OPERATIONS, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--scratch-dir", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.worker:
+        args.operation = args.worker
+        run_worker(args)
+        return 0
+    report = run_suite(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        return 1 if compare(baseline, report, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import PyInstaller.__main__
 import os
+import sys
 from datetime import datetime # Import datetime for timestamp
 
 # Generate a timestamp
@@ -16,6 +17,11 @@ pyinstaller_args = [
     '--icon=icon.ico',  # Use an icon if available
 ]
 
+# --onedir builds a folder instead: no unpacking to a temp dir on every
+# launch, so the app starts faster (ship the whole folder)
+if '--onedir' in sys.argv[1:]:
+    pyinstaller_args[pyinstaller_args.index('--onefile')] = '--onedir'
+
 # Check if icon file exists, if not, remove the icon argument
 if not os.path.exists('icon.ico'):
     pyinstaller_args.remove('--icon=icon.ico')
@@ -25,4 +31,7 @@ if not os.path.exists('icon.ico'):
 if __name__ == '__main__':
     print("Starting PyInstaller build process...")
     PyInstaller.__main__.run(pyinstaller_args)
-    print("Build completed! The executable is in the 'dist' folder.")
+    if '--onedir' in pyinstaller_args:
+        print(f"Build completed! The app is in 'dist/{app_name}'.")
+    else:
+        print("Build completed! The executable is in the 'dist' folder.")
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import socket
+import struct
+import threading
+import zlib
+from collections import deque
+
+MAGIC = b"TTCK"
+VERSION = 1
+IDLE, RUNNING, PAUSED = 0, 1, 2
+NAME_BYTES = 256
+# magic, version, state, seq, session start (epoch), tracked seconds,
+# paused seconds, written at (epoch), task, project; then a CRC32 of it all
+_BODY = struct.Struct(f"<4sBBxxQdddd{NAME_BYTES}s{NAME_BYTES}s")
+RECORD = struct.Struct(f"<{_BODY.size}sI")
+
+
+def checkpoint_path(data_file):
+    """The checkpoint of this user's session on this machine for a data file.
+
+    Kept in the home folder rather than beside the data file, so instances
+    sharing one data file (e.g. on a network drive) never see each other's
+    sessions.
+    """
+    path = os.path.abspath(data_file.rstrip("/\\"))
+    key = f"{socket.gethostname()}\0{path}"
+    digest = hashlib.sha1(key.encode(errors="surrogateescape")).hexdigest()[:16]
+    return os.path.join(os.path.expanduser("~"), f".time_tracker_session-{digest}")
+
+
+def _name_bytes(name):
+    # Truncated on a character boundary so it always decodes
+    return (name or "").encode()[:NAME_BYTES].decode(errors="ignore").encode()
+
+
+class SessionCheckpoint:
+    """The running session, saved to a small fixed-size file.
+
+    Every write overwrites one of two fixed slots in place (alternating,
+    with a sequence number and a CRC), so a write costs the same however
+    long the history is, and a write torn by a crash leaves the other
+    slot intact. read() returns the newest valid record.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._seq = None
+        self._session = None  # Session start of the last record written
+        self._lock = threading.Lock()
+
+    def write(self, state, session_start, tracked, paused, task, project, written_at):
+        """Record the session; timestamps are epoch seconds, durations seconds."""
+        with self._lock:
+            self._put(state, session_start, tracked, paused, task, project, written_at)
+
+    def _put(self, state, session_start, tracked, paused, task, project, written_at):
+        self._resume_seq()
+        self._seq += 1
+        body = _BODY.pack(
+            MAGIC,
+            VERSION,
+            state,
+            self._seq,
+            session_start,
+            tracked,
+            paused,
+            written_at,
+            _name_bytes(task),
+            _name_bytes(project),
+        )
+        if self._fd is None:
+            flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+            self._fd = os.open(self.path, flags, 0o600)
+        os.lseek(self._fd, (self._seq % 2) * RECORD.size, os.SEEK_SET)
+        os.write(self._fd, RECORD.pack(body, zlib.crc32(body)))
+        # Only the data has to reach the disk, not the file's metadata
+        getattr(os, "fdatasync", os.fsync)(self._fd)
+        self._session = session_start if state != IDLE else None
+
+    def clear(self, session_start=None):
+        """Mark no session as running.
+
+        With session_start, only if the last record written belongs to that
+        session, so a late clear can't wipe a session started since.
+        """
+        with self._lock:
+            self._resume_seq()
+            if self._session is None:
+                return  # Already idle (or never written)
+            if session_start is not None and session_start != self._session:
+                return
+            self._put(IDLE, 0.0, 0.0, 0.0, "", "", 0.0)
+
+    def _resume_seq(self):
+        # Carry on from the newest record on disk, so this one lands in the
+        # other slot and sorts after it
+        if self._seq is None:
+            latest = self._read_slots()
+            self._seq = latest["seq"] if latest else 0
+            if latest and latest["state"] != IDLE:
+                self._session = latest["session_start"]
+
+    def read(self):
+        """The interrupted session, or None if it ended cleanly or is unreadable.
+
+        Returns {"state", "session_start", "tracked", "paused", "task",
+        "project", "written_at"}.
+        """
+        with self._lock:
+            latest = self._read_slots()
+        if latest is None or latest["state"] == IDLE:
+            return None
+        del latest["seq"]
+        return latest
+
+    def _read_slots(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read(2 * RECORD.size)
+        except FileNotFoundError:
+            return None
+        latest = None
+        for offset in (0, RECORD.size):
+            chunk = data[offset : offset + RECORD.size]
+            if len(chunk) != RECORD.size:
+                continue
+            body, crc = RECORD.unpack(chunk)
+            if zlib.crc32(body) != crc:
+                continue  # Torn or never written
+            fields = _BODY.unpack(body)
+            if fields[0] != MAGIC or fields[1] != VERSION:
+                continue
+            if latest is None or fields[3] > latest["seq"]:
+                latest = {
+                    "state": fields[2],
+                    "seq": fields[3],
+                    "session_start": fields[4],
+                    "tracked": fields[5],
+                    "paused": fields[6],
+                    "written_at": fields[7],
+                    "task": fields[8].rstrip(b"\0").decode(errors="replace"),
+                    "project": fields[9].rstrip(b"\0").decode(errors="replace"),
+                }
+        return latest
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class CheckpointWriter:
+    """Runs checkpoint writes and clears on a dedicated thread.
+
+    Callers (the Tk thread, the clock thread) only queue them, so they never
+    wait on the disk. A write still waiting is replaced by a newer one, as
+    only the latest state matters; clears run in order after the writes
+    queued before them.
+    """
+
+    def __init__(self):
+        self._ops = deque()  # (task, replaceable)
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="time-tracker-checkpoint", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, task, replace=False):
+        with self._cond:
+            if replace and self._ops and self._ops[-1][1]:
+                self._ops[-1] = (task, True)
+            else:
+                self._ops.append((task, replace))
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every queued task has run; False if the timeout expired."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._ops and not self._busy, timeout
+            )
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ops or self._closed)
+                if not self._ops:
+                    return
+                task, _ = self._ops.popleft()
+                self._busy = True
+            try:
+                task()
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
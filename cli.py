@@ -0,0 +1,513 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from itertools import batched
+
+from columnar import GROUPINGS, EntryColumns
+from control_server import DEFAULT_PORT, request
+from integrity import check_data_file, check_entry
+from retention import archive_path, summarize_before
+from rollup import rollup
+from storage import (
+    JOURNAL_EXTENSIONS,
+    SQLITE_EXTENSIONS,
+    JournalStorage,
+    JsonFileStorage,
+    dump_json_array,
+    open_storage,
+)
+from time_entry import ENTRY_FIELDS, to_json
+from tracker_logic import TimeTrackerLogic
+
+SETTINGS_PATH = os.path.join(os.path.expanduser("~"), ".time_tracker_settings.json")
+# Running session started with `cli.py start`, until `cli.py stop`
+SESSION_PATH = os.path.join(os.path.expanduser("~"), ".time_tracker_session.json")
+
+INT_FIELDS = ("duration_seconds", "break_seconds")
+FLOAT_FIELDS = ("earnings",)
+
+
+def _load_settings():
+    try:
+        with open(SETTINGS_PATH, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Failed to load settings: {e}", file=sys.stderr)
+        return {}
+
+
+def _data_file(args):
+    path = args.data_file or _load_settings().get("data_file")
+    if not path:
+        path = os.path.join(os.path.expanduser("~"), "time_tracker_data.json")
+    return os.path.expandvars(os.path.expanduser(path))
+
+
+def _file_format(path, explicit):
+    if explicit:
+        return explicit
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith(JOURNAL_EXTENSIONS):
+        return "jsonl"
+    return "json"
+
+
+def _from_csv_row(row):
+    entry = {}
+    for key, value in row.items():
+        if key is None or value is None or value == "":
+            continue
+        try:
+            if key in INT_FIELDS:
+                value = int(float(value))
+            elif key in FLOAT_FIELDS:
+                value = float(value)
+        except (ValueError, OverflowError):
+            raise ValueError(f"{key} is not a number ({value!r})") from None
+        entry[key] = value
+    return entry
+
+
+def read_entries(path, fmt, on_problem=None):
+    """Yield entries from a CSV, JSON Lines or JSON array file, one at a time.
+
+    With on_problem, entries that don't fit the saved schema (see
+    check_entry) are skipped, and on_problem(where, problem) is called for
+    each; where is "line N" for CSV and "entry N" otherwise.
+    """
+    if fmt == "csv":
+        with open(path, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                try:
+                    entry = _from_csv_row(row)
+                except ValueError as e:
+                    if on_problem is None:
+                        raise
+                    on_problem(f"line {reader.line_num}", str(e))
+                    continue
+                if on_problem is not None:
+                    problem = check_entry(entry)
+                    if problem is not None:
+                        on_problem(f"line {reader.line_num}", problem)
+                        continue
+                yield entry
+        return
+    if fmt == "jsonl":
+        entries = JournalStorage(path).iter_entries()
+    else:
+        entries = JsonFileStorage(path).iter_entries()
+    if on_problem is None:
+        yield from entries
+        return
+    for number, entry in enumerate(entries, 1):
+        problem = check_entry(entry)
+        if problem is None:
+            yield entry
+        else:
+            on_problem(f"entry {number}", problem)
+
+
+def write_entries(entries, f, fmt):
+    """Stream entries to an open text file. Returns the number written."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fieldnames=ENTRY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for entry in entries:
+            writer.writerow(entry)
+            count += 1
+    elif fmt == "jsonl":
+        for entry in entries:
+            f.write(json.dumps(entry, default=to_json) + "\n")
+            count += 1
+    else:
+        count = dump_json_array(entries, f)
+        f.write("\n")
+    return count
+
+
+def _filtered(entries, project=None, date_from=None, date_to=None):
+    for entry in entries:
+        if project is not None and entry.get("project") != project:
+            continue
+        day = entry.get("date", "")
+        if date_from is not None and day < date_from:
+            continue
+        if date_to is not None and day > date_to:
+            continue
+        yield entry
+
+
+def cmd_import(args):
+    fmt = _file_format(args.file, args.format)
+    storage = open_storage(_data_file(args))
+    count = skipped = 0
+
+    def report(where, problem):
+        nonlocal skipped
+        skipped += 1
+        print(f"{args.file}: {where}: {problem} (skipped)", file=sys.stderr)
+
+    try:
+        # Constant memory: read, check, convert and write one batch at a time
+        entries = read_entries(args.file, fmt, on_problem=report)
+        for batch in batched(entries, args.batch_size):
+            storage.append_many(batch)
+            count += len(batch)
+    except Exception as e:
+        # Earlier batches are already written; importing again duplicates them
+        print(
+            f"Import stopped after {count} entries were written "
+            f"to {storage.path}: {e}",
+            file=sys.stderr,
+        )
+        return 1
+    finally:
+        storage.close()
+    print(f"Imported {count} entries into {storage.path}")
+    if skipped:
+        print(f"Skipped {skipped} invalid entries", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_export(args):
+    fmt = _file_format(args.file, args.format)
+    storage = open_storage(_data_file(args))
+    try:
+        entries = _filtered(
+            storage.iter_entries(), args.project, args.date_from, args.date_to
+        )
+        if args.file == "-":
+            count = write_entries(entries, sys.stdout, fmt)
+        else:
+            with open(args.file, "w", newline="" if fmt == "csv" else None) as f:
+                count = write_entries(entries, f, fmt)
+    finally:
+        storage.close()
+    if args.file != "-":
+        print(f"Exported {count} entries to {args.file}")
+    return 0
+
+
+def cmd_start(args):
+    if not args.task.strip():
+        print("Please enter a task name", file=sys.stderr)
+        return 1
+    if os.path.exists(SESSION_PATH):
+        with open(SESSION_PATH, "r") as f:
+            session = json.load(f)
+        print(f"Already tracking: {session['task']}", file=sys.stderr)
+        return 1
+    session = {
+        "task": args.task,
+        "project": args.project or "",
+        "start_time": datetime.now().isoformat(),
+    }
+    with open(SESSION_PATH, "w") as f:
+        json.dump(session, f, indent=2)
+    status_text = f"Tracking: {args.task}"
+    if args.project:
+        status_text += f" (Project: {args.project})"
+    print(status_text)
+    return 0
+
+
+def cmd_stop(args):
+    if not os.path.exists(SESSION_PATH):
+        print("No running session", file=sys.stderr)
+        return 1
+    with open(SESSION_PATH, "r") as f:
+        session = json.load(f)
+    start_ts = datetime.fromisoformat(session["start_time"])
+    end_ts = datetime.now()
+
+    # Only appends, so the history doesn't need to be loaded
+    logic = TimeTrackerLogic(data_file=_data_file(args), autoload=False)
+    logic.set_callbacks(
+        update_time_cb=None,
+        update_status_cb=None,
+        show_warning_cb=None,
+        show_error_cb=lambda title, message: print(message, file=sys.stderr),
+    )
+    rate = args.rate if args.rate is not None else _load_settings().get("hourly_rate")
+    logic.set_hourly_rate(rate or 0.0)
+    written = []
+    logic.save_time_entry(
+        session["task"],
+        session["project"],
+        max(timedelta(), end_ts - start_ts),
+        start_ts,
+        end_ts,
+        timedelta(),
+        on_written=lambda: written.append(True),
+    )
+    logic.close()
+    if not written:
+        # The error was printed; keep the session so stop can be retried
+        print(f"Session kept in {SESSION_PATH}", file=sys.stderr)
+        return 1
+    os.remove(SESSION_PATH)
+    entry = logic.data[-1]
+    print(
+        f"Saved {entry['task']}: "
+        f"{TimeTrackerLogic.format_elapsed(entry['duration_seconds'])}"
+    )
+    return 0
+
+
+def cmd_report(args):
+    storage = open_storage(_data_file(args))
+    try:
+        # Only the compact columns are kept, never the entries themselves
+        columns = EntryColumns.from_entries(storage.iter_entries())
+    finally:
+        storage.close()
+    by = args.by[0] if len(args.by) == 1 else tuple(args.by)
+    totals = columns.totals(by, args.date_from, args.date_to)
+    if args.json:
+        rows = [
+            {"group": list(key) if isinstance(key, tuple) else key, **values}
+            for key, values in totals.items()
+        ]
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+        return 0
+    _print_totals(totals)
+    return 0
+
+
+def cmd_compact(args):
+    storage = open_storage(_data_file(args))
+    try:
+        if not hasattr(storage, "compact"):
+            print(f"{storage.kind} data files do not need compacting")
+            return 0
+        storage.compact()
+    finally:
+        storage.close()
+    print(f"Compacted {storage.path}")
+    return 0
+
+
+def cmd_summarize(args):
+    days = args.older_than
+    if days is None:
+        days = int(_load_settings().get("retention_days") or 365)
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    path = _data_file(args)
+    storage = open_storage(path)
+    try:
+        stats = summarize_before(
+            storage, cutoff, None if args.no_archive else archive_path(path)
+        )
+    finally:
+        storage.close()
+    print(
+        f"Folded {stats['folded']} entries before {cutoff} into "
+        f"{stats['summaries']} day summaries; kept {stats['kept']} records"
+    )
+    return 0
+
+
+def cmd_check(args):
+    path = _data_file(args)
+
+    def report(name, offset, problem):
+        where = "row" if name.lower().endswith(SQLITE_EXTENSIONS) else "byte"
+        print(f"{name}: {where} {offset}: {problem}")
+
+    stats = check_data_file(path, args.repair, on_problem=report)
+    print(
+        f"Checked {stats['checked']} records: {stats['bad']} damaged",
+        file=sys.stderr,
+    )
+    if args.repair:
+        print(f"Wrote {stats['kept']} good records to {args.repair}", file=sys.stderr)
+    return 1 if stats["bad"] else 0
+
+
+def _print_totals(totals):
+    for key, values in totals.items():
+        label = " / ".join(key) if isinstance(key, tuple) else key
+        print(
+            f"{label or '(none)':<32} "
+            f"{TimeTrackerLogic.format_elapsed(values['duration_seconds'])}  "
+            f"break {TimeTrackerLogic.format_elapsed(values['break_seconds'])}  "
+            f"${values['earnings']:.2f}  ({values['entries']} entries)"
+        )
+
+
+def cmd_rollup(args):
+    by = args.by[0] if len(args.by) == 1 else tuple(args.by)
+    totals, stats = rollup(
+        args.paths,
+        by,
+        args.date_from,
+        args.date_to,
+        jobs=args.jobs,
+        per_file=args.per_file,
+        on_error=lambda path, e: print(f"Skipped {path}: {e}", file=sys.stderr),
+    )
+    if args.json:
+        rows = [
+            {"group": list(key) if isinstance(key, tuple) else key, **values}
+            for key, values in totals.items()
+        ]
+        json.dump({"totals": rows, "stats": stats}, sys.stdout, indent=2)
+        print()
+    else:
+        _print_totals(totals)
+    print(
+        f"{stats['files'] - stats['skipped']} of {stats['files']} files, "
+        f"{stats['entries']} entries in {stats['seconds']:.2f}s "
+        f"({stats['entries_per_sec'] or 0:,.0f} entries/s, "
+        f"{stats['mb_per_sec'] or 0:.1f} MB/s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def cmd_remote(args):
+    params = {}
+    if args.task is not None:
+        params["task"] = args.task
+    if args.project is not None:
+        params["project"] = args.project
+    if args.method == "report":
+        params.update(by=args.by, **{"from": args.date_from, "to": args.date_to})
+    result = request(args.method, params, port=args.port, socket_path=args.socket)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="time-tracker", description="Headless Time Tracker commands"
+    )
+    parser.add_argument(
+        "--data-file", help="Data file to use (default: the one from Settings)"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    formats = ("csv", "json", "jsonl")
+
+    p = sub.add_parser("import", help="Append entries from a CSV/JSON/JSONL file")
+    p.add_argument("file")
+    p.add_argument("--format", choices=formats, help="Default: from the extension")
+    p.add_argument("--batch-size", type=int, default=1000)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="Write entries to a CSV/JSON/JSONL file")
+    p.add_argument("file", help="Output path, or - for stdout")
+    p.add_argument("--format", choices=formats, help="Default: from the extension")
+    p.add_argument("--project")
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("start", help="Start tracking a task")
+    p.add_argument("task")
+    p.add_argument("--project", default="")
+    p.set_defaults(func=cmd_start)
+
+    p = sub.add_parser("stop", help="Stop the running task and save it")
+    p.add_argument("--rate", type=float, help="Hourly rate (default: from Settings)")
+    p.set_defaults(func=cmd_stop)
+
+    p = sub.add_parser("report", help="Print grouped totals")
+    p.add_argument("--by", nargs="+", choices=GROUPINGS, default=["project"])
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD")
+    p.add_argument("--json", action="store_true", help="Machine-readable output")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser(
+        "compact", help="Rewrite a journal or partitioned store in place"
+    )
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser(
+        "summarize", help="Fold old entries into per-day, per-project summaries"
+    )
+    p.add_argument(
+        "--older-than",
+        type=int,
+        metavar="DAYS",
+        help="Age in days (default: from Settings, else 365)",
+    )
+    p.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="Don't keep the raw entries in <data file>.archive.jsonl.gz",
+    )
+    p.set_defaults(func=cmd_summarize)
+
+    p = sub.add_parser(
+        "check", help="Validate every record and report damaged ones by offset"
+    )
+    p.add_argument(
+        "--repair",
+        metavar="NEW_FILE",
+        help="Also write the good records to NEW_FILE (format from its extension)",
+    )
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser(
+        "rollup", help="Totals across many data files (e.g. a whole team)"
+    )
+    p.add_argument("paths", nargs="+", help="Data files, or folders to search")
+    p.add_argument("--by", nargs="+", choices=GROUPINGS, default=["project", "week"])
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD")
+    p.add_argument(
+        "--per-file", action="store_true", help="Keep each file's totals apart"
+    )
+    p.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    p.add_argument("--json", action="store_true", help="Machine-readable output")
+    p.set_defaults(func=cmd_rollup)
+
+    p = sub.add_parser(
+        "remote", help="Send a request to a running app's control API"
+    )
+    p.add_argument(
+        "method",
+        choices=("start", "pause", "resume", "stop", "status", "report", "projects"),
+    )
+    p.add_argument("--task")
+    p.add_argument("--project")
+    p.add_argument("--by", nargs="+", choices=GROUPINGS, default=["project"])
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--socket", help="Unix socket path instead of --port")
+    p.set_defaults(func=cmd_remote)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "batch_size", 1) < 1:
+        print("--batch-size must be at least 1", file=sys.stderr)
+        return 2
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Output piped into a reader that exited early (e.g. `| head`)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
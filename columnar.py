@@ -0,0 +1,292 @@
+from array import array
+from itertools import compress
+from datetime import date
+
+from retention import entry_count
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the array-based path is used without it
+    np = None
+
+
+# Dimensions a report can be grouped by
+GROUPINGS = ("project", "task", "date", "week", "month")
+
+
+def _day_ordinal(value):
+    """Parse "YYYY-MM-DD" into a proleptic ordinal; 0 when missing or malformed."""
+    try:
+        return date.fromisoformat(value[:10]).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+def _day_label(ordinal, by):
+    if not ordinal:
+        return ""
+    day = date.fromordinal(ordinal)
+    if by == "date":
+        return day.isoformat()
+    if by == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{day.year}-{day.month:02d}"
+
+
+class EntryColumns:
+    """Column-oriented copy of the history for fast grouped aggregation.
+
+    Numbers live in typed arrays, dates as day ordinals, and projects and
+    tasks as integer codes into interned name tables. totals() uses NumPy
+    over the arrays' buffers when it is installed and falls back to plain
+    loops over the arrays otherwise.
+    """
+
+    def __init__(self):
+        self.project_names = []
+        self.task_names = []
+        self._project_codes = {}
+        self._task_codes = {}
+        self._day_cache = {}
+        self.project = array("I")
+        self.task = array("I")
+        self.day = array("i")
+        self.duration = array("q")
+        self.breaks = array("q")
+        self.earnings = array("d")
+        self.count = array("I")  # Entries per row: more than 1 for day summaries
+
+    @classmethod
+    def from_entries(cls, entries):
+        columns = cls()
+        columns.extend(entries)
+        return columns
+
+    def __len__(self):
+        return len(self.day)
+
+    def copy(self):
+        """A copy later appends don't change, for totals() without a lock.
+
+        The arrays are copied with one memcpy each, so this is quick even
+        for millions of rows.
+        """
+        other = EntryColumns()
+        other.project_names = self.project_names[:]
+        other.task_names = self.task_names[:]
+        other._project_codes = dict(self._project_codes)
+        other._task_codes = dict(self._task_codes)
+        other._day_cache = dict(self._day_cache)
+        columns = ("project", "task", "day", "duration", "breaks", "earnings", "count")
+        for name in columns:
+            setattr(other, name, getattr(self, name)[:])
+        return other
+
+    def _code(self, codes, names, name):
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def append(self, entry):
+        self.extend((entry,))
+
+    def extend(self, entries):
+        project_codes, project_names = self._project_codes, self.project_names
+        task_codes, task_names = self._task_codes, self.task_names
+        day_cache = self._day_cache
+        code = self._code
+        add_project, add_task, add_day = (
+            self.project.append,
+            self.task.append,
+            self.day.append,
+        )
+        add_duration, add_break, add_earnings, add_count = (
+            self.duration.append,
+            self.breaks.append,
+            self.earnings.append,
+            self.count.append,
+        )
+        for entry in entries:
+            project = (entry.get("project") or "").strip()
+            task = (entry.get("task") or "").strip()
+            raw_day = entry.get("date")
+            day = day_cache.get(raw_day)
+            if day is None:
+                day = day_cache[raw_day] = _day_ordinal(raw_day)
+            project_code = project_codes.get(project)
+            if project_code is None:
+                project_code = code(project_codes, project_names, project)
+            task_code = task_codes.get(task)
+            if task_code is None:
+                task_code = code(task_codes, task_names, task)
+            add_project(project_code)
+            add_task(task_code)
+            add_day(day)
+            add_duration(int(entry.get("duration_seconds") or 0))
+            add_break(int(entry.get("break_seconds") or 0))
+            add_earnings(float(entry.get("earnings") or 0.0))
+            add_count(entry_count(entry))
+
+    def totals(self, by="project", date_from=None, date_to=None):
+        """Sum duration, break and earnings per group.
+
+        by is one of GROUPINGS or a tuple of them (e.g. ("project", "week")),
+        in which case keys are tuples. date_from/date_to are inclusive
+        "YYYY-MM-DD" bounds. Returns {key: {"duration_seconds",
+        "break_seconds", "earnings", "entries"}} sorted by key.
+        """
+        dims = (by,) if isinstance(by, str) else tuple(by)
+        for dim in dims:
+            if dim not in GROUPINGS:
+                raise ValueError(f"Unknown grouping {dim!r}; use one of {GROUPINGS}")
+        lo = _day_ordinal(date_from) if date_from else None
+        hi = _day_ordinal(date_to) if date_to else None
+        if np is not None:
+            groups = self._totals_numpy(dims, lo, hi)
+        else:
+            groups = self._totals_python(dims, lo, hi)
+        return dict(sorted(groups.items()))
+
+    def _labels(self, dim, days):
+        """Return (code per unique value, label per code) for a dimension."""
+        if dim == "project":
+            return None, self.project_names
+        if dim == "task":
+            return None, self.task_names
+        labels = []
+        label_codes = {}
+        day_codes = {}
+        for ordinal in days:
+            label = _day_label(ordinal, dim)
+            code = label_codes.get(label)
+            if code is None:
+                code = label_codes[label] = len(labels)
+                labels.append(label)
+            day_codes[ordinal] = code
+        return day_codes, labels
+
+    def _group_key(self, combined, sizes, labels):
+        parts = []
+        for size, names in zip(reversed(sizes), reversed(labels)):
+            combined, code = divmod(combined, size)
+            parts.append(names[code])
+        parts.reverse()
+        return parts[0] if len(parts) == 1 else tuple(parts)
+
+    def _totals_numpy(self, dims, lo, hi):
+        day = np.frombuffer(self.day, dtype=self.day.typecode)
+        mask = None
+        if lo is not None:
+            mask = day >= lo
+        if hi is not None:
+            mask = (day <= hi) if mask is None else (mask & (day <= hi))
+
+        def column(values):
+            data = np.frombuffer(values, dtype=values.typecode)
+            return data if mask is None else data[mask]
+
+        day = column(self.day)
+        combined = np.zeros(len(day), dtype=np.int64)
+        sizes, labels = [], []
+        for dim in dims:
+            if dim in ("project", "task"):
+                codes = column(self.project if dim == "project" else self.task)
+                _, names = self._labels(dim, ())
+            else:
+                unique_days, inverse = np.unique(day, return_inverse=True)
+                day_codes, names = self._labels(dim, unique_days.tolist())
+                lookup = np.array(
+                    [day_codes[d] for d in unique_days.tolist()], dtype=np.int64
+                )
+                codes = lookup[inverse]
+            size = max(len(names), 1)
+            combined = combined * size + codes
+            sizes.append(size)
+            labels.append(names)
+
+        keys, inverse = np.unique(combined, return_inverse=True)
+        size = len(keys)
+        counts = np.bincount(inverse, weights=column(self.count), minlength=size)
+        durations = np.bincount(inverse, weights=column(self.duration), minlength=size)
+        breaks = np.bincount(inverse, weights=column(self.breaks), minlength=size)
+        earnings = np.bincount(inverse, weights=column(self.earnings), minlength=size)
+        return {
+            self._group_key(int(key), sizes, labels): {
+                "duration_seconds": int(durations[i]),
+                "break_seconds": int(breaks[i]),
+                "earnings": round(float(earnings[i]), 4),
+                "entries": int(counts[i]),
+            }
+            for i, key in enumerate(keys.tolist())
+        }
+
+    def _totals_python(self, dims, lo, hi):
+        columns = (
+            self.project,
+            self.task,
+            self.day,
+            self.duration,
+            self.breaks,
+            self.earnings,
+            self.count,
+        )
+        if lo is not None or hi is not None:
+            lo = lo if lo is not None else 0
+            hi = hi if hi is not None else date.max.toordinal()
+            keep = [lo <= d <= hi for d in self.day]
+            columns = [list(compress(values, keep)) for values in columns]
+        project, task, day, duration, breaks, earnings, count = columns
+
+        combined = None
+        sizes, labels = [], []
+        for dim in dims:
+            if dim in ("project", "task"):
+                codes = project if dim == "project" else task
+                _, names = self._labels(dim, ())
+            else:
+                day_codes, names = self._labels(dim, set(day))
+                codes = list(map(day_codes.__getitem__, day))
+            size = max(len(names), 1)
+            if combined is None:
+                combined = codes
+            else:
+                combined = [c * size + code for c, code in zip(combined, codes)]
+            sizes.append(size)
+            labels.append(names)
+
+        # Accumulate into dense lists indexed by group code; sparse key spaces
+        # (e.g. task x date) are renumbered first so the lists stay small
+        slots = 1
+        for size in sizes:
+            slots *= size
+        if slots > 2 * len(day) + 1024:
+            dense = {}
+            combined = [dense.setdefault(c, len(dense)) for c in combined]
+            keys = list(dense)
+        else:
+            keys = range(slots)
+        counts = [0] * len(keys)
+        durations = [0] * len(keys)
+        break_totals = [0] * len(keys)
+        earning_totals = [0.0] * len(keys)
+        for c, value in zip(combined, count):
+            counts[c] += value
+        for c, value in zip(combined, duration):
+            durations[c] += value
+        for c, value in zip(combined, breaks):
+            break_totals[c] += value
+        for c, value in zip(combined, earnings):
+            earning_totals[c] += value
+        return {
+            self._group_key(keys[i], sizes, labels): {
+                "duration_seconds": durations[i],
+                "break_seconds": break_totals[i],
+                "earnings": round(earning_totals[i], 4),
+                "entries": counts[i],
+            }
+            for i in range(len(keys))
+            if counts[i]
+        }
@@ -0,0 +1,100 @@
+import heapq
+from bisect import bisect_left, insort
+from datetime import date
+
+# Each use counts 2 ** ((day - _EPOCH) / HALF_LIFE_DAYS): a use HALF_LIFE_DAYS
+# older weighs half as much, and scores never need decaying over time
+HALF_LIFE_DAYS = 30
+_EPOCH = date(2000, 1, 1).toordinal()
+
+
+def _weight(day):
+    try:
+        ordinal = date.fromisoformat(day[:10]).toordinal()
+    except (TypeError, ValueError):
+        ordinal = _EPOCH
+    return 2.0 ** ((ordinal - _EPOCH) / HALF_LIFE_DAYS)
+
+
+def _subsequence(needle, haystack, position=0):
+    """Whether needle's characters appear in haystack[position:] in order."""
+    for char in needle:
+        position = haystack.find(char, position) + 1
+        if not position:
+            return False
+    return True
+
+
+class NameIndex:
+    """Prefix and fuzzy lookup over names, ranked by frecency.
+
+    Names are kept casefolded in a sorted list, so the names starting with
+    some text are found with two bisects. Each use adds to a name's score
+    with a weight that doubles every HALF_LIFE_DAYS, so recent and
+    frequent names rank first. add() inserts a new name in place.
+    """
+
+    def __init__(self):
+        self._keys = []  # Sorted casefolded names
+        self._names = {}  # Casefolded -> name as last used
+        self._scores = {}
+        self._weights = {}  # Day -> weight; few distinct days, many uses
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, name, day=None):
+        self.add_many(((name, day),))
+
+    def add_many(self, uses):
+        """Add (name, day) pairs; many new names are sorted in at once."""
+        new = [key for name, day in uses if (key := self._use(name, day)) is not None]
+        if len(new) > 64:
+            self._keys += new
+            self._keys.sort()
+            return
+        for key in new:
+            if not self._keys or key > self._keys[-1]:
+                self._keys.append(key)
+            else:
+                insort(self._keys, key)
+
+    def _use(self, name, day):
+        """Count one use of name; returns its key if the name is new."""
+        name = name.strip() if isinstance(name, str) else ""
+        if not name:
+            return None
+        key = name.casefold()
+        weight = self._weights.get(day)
+        if weight is None:
+            weight = self._weights[day] = _weight(day)
+        new = key not in self._names
+        self._scores[key] = weight if new else self._scores[key] + weight
+        self._names[key] = name
+        return key if new else None
+
+    def names(self):
+        return list(self._names.values())
+
+    def complete(self, text, limit=8):
+        """Up to limit names for text, best first.
+
+        Names starting with text come first, then names that start with
+        its first character and contain the rest in order (so "cr" also
+        finds "Code review").
+        """
+        text = text.strip().casefold()
+        keys, scores = self._keys, self._scores
+        lo = bisect_left(keys, text)
+        hi = bisect_left(keys, text + "\U0010ffff", lo)
+        found = heapq.nlargest(limit, keys[lo:hi], key=scores.__getitem__)
+        if len(found) < limit and text:
+            first = bisect_left(keys, text[0])
+            last = bisect_left(keys, text[0] + "\U0010ffff", first)
+            fuzzy = (
+                key
+                for key in keys[first:last]
+                if not key.startswith(text) and _subsequence(text[1:], key, 1)
+            )
+            found += heapq.nlargest(limit - len(found), fuzzy, key=scores.__getitem__)
+        return [self._names[key] for key in found]
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+from concurrent.futures import Future
+
+DEFAULT_PORT = 47213
+# Methods that only read state; batches of these skip the logic thread
+READ_ONLY = frozenset(("status", "report", "projects"))
+
+
+class LogicController:
+    """Runs control requests against a TimeTrackerLogic.
+
+    call() is how the server gets onto the thread that owns the logic
+    state. Here that is whichever thread holds self._lock; the GUI passes
+    a subclass that hops onto the Tk thread instead.
+    """
+
+    def __init__(self, logic):
+        self.logic = logic
+        self.task = ""
+        self.project = ""
+        self._lock = threading.Lock()
+
+    def call(self, fn):
+        """Run fn where the logic may be mutated; returns a Future."""
+        future = Future()
+        with self._lock:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+        return future
+
+    def start(self, task=None, project=None):
+        if task is not None:
+            self.task, self.project = task, project or ""
+        self.logic.start_timer(self.task, self.project)
+
+    def pause(self):
+        self.logic.pause_timer()
+
+    def stop(self, task=None, project=None):
+        if task is not None:
+            self.task, self.project = task, project or ""
+        self.logic.stop_timer(self.task, self.project)
+
+    def status(self):
+        elapsed = int(self.logic.current_elapsed().total_seconds())
+        return {
+            "running": self.logic.is_running,
+            "paused": self.logic.is_paused,
+            "task": self.task,
+            "project": self.project,
+            "elapsed_seconds": elapsed,
+            "elapsed": self.logic.format_elapsed(elapsed),
+        }
+
+    def report(self, by="project", date_from=None, date_to=None):
+        by = by if isinstance(by, str) else tuple(by)
+        return [
+            {"group": list(key) if isinstance(key, tuple) else key, **values}
+            for key, values in self.logic.report(by, date_from, date_to).items()
+        ]
+
+    def projects(self):
+        return self.logic.get_unique_projects()
+
+
+def _handle(controller, request):
+    """Run one decoded request; returns the response dict."""
+    try:
+        if not isinstance(request, dict):
+            raise ValueError("Requests must be JSON objects")
+        method = request.get("method")
+        params = request.get("params") or {}
+        if method in ("start", "resume"):
+            if method == "start":
+                controller.start(params.get("task"), params.get("project"))
+            else:
+                controller.start()
+            # Refused starts are only reported through the warning callback
+            if not controller.logic.is_running:
+                raise ValueError("Session not started: a task name is required")
+        elif method == "pause":
+            controller.pause()
+        elif method == "stop":
+            controller.stop(params.get("task"), params.get("project"))
+        elif method == "report":
+            return {
+                "id": request.get("id"),
+                "result": controller.report(
+                    params.get("by", "project"),
+                    params.get("from"),
+                    params.get("to"),
+                ),
+            }
+        elif method == "projects":
+            return {"id": request.get("id"), "result": controller.projects()}
+        elif method != "status":
+            raise ValueError(f"Unknown method {method!r}")
+        return {"id": request.get("id"), "result": controller.status()}
+    except Exception as e:
+        request_id = request.get("id") if isinstance(request, dict) else None
+        return {"id": request_id, "error": str(e)}
+
+
+class ControlServer:
+    """Local control API on an asyncio loop in a background thread.
+
+    Speaks JSON Lines: each request is one line such as
+    {"id": 1, "method": "start", "params": {"task": "Review"}} and gets one
+    response line with the same id and either "result" or "error".
+    Methods: start, pause, resume, stop, status, report, projects.
+
+    Listens on a Unix socket when socket_path is given, otherwise on
+    127.0.0.1:port. Clients may pipeline: all complete lines that arrive
+    together are run as one batch (one trip to the logic thread) and
+    answered with one write. Batches that only read state run in a worker
+    thread without touching the logic thread.
+    """
+
+    def __init__(self, controller, port=DEFAULT_PORT, socket_path=None):
+        self.controller = controller
+        self.port = port
+        self.socket_path = socket_path
+        self._loop = None
+        self._stopped = None
+        self._thread = None
+        self._ready = threading.Event()
+        self.error = None
+
+    def start(self):
+        """Start serving; raises if the address can't be bound."""
+        self._thread = threading.Thread(
+            target=asyncio.run,
+            args=(self._serve(),),
+            name="time-tracker-control",
+            daemon=True,
+        )
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def close(self, timeout=5):
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._thread.join(timeout)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        try:
+            if self.socket_path:
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)  # Left over from a crash
+                server = await asyncio.start_unix_server(
+                    self._client, path=self.socket_path
+                )
+                os.chmod(self.socket_path, 0o600)
+            else:
+                server = await asyncio.start_server(
+                    self._client, host="127.0.0.1", port=self.port
+                )
+                self.port = server.sockets[0].getsockname()[1]
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        async with server:
+            await self._stopped.wait()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def _client(self, reader, writer):
+        pending = b""
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                pending += chunk
+                lines, _, pending = pending.rpartition(b"\n")
+                if not lines:
+                    continue
+                responses = await self._run_batch(lines.split(b"\n"))
+                writer.write(
+                    b"".join(json.dumps(r).encode() + b"\n" for r in responses)
+                )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _run_batch(self, lines):
+        requests = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                requests.append(json.loads(line))
+            except ValueError as e:
+                requests.append(e)
+
+        def run():
+            return [
+                {"id": None, "error": f"Invalid JSON: {request}"}
+                if isinstance(request, ValueError)
+                else _handle(self.controller, request)
+                for request in requests
+            ]
+
+        read_only = all(
+            isinstance(request, dict) and request.get("method") in READ_ONLY
+            for request in requests
+        )
+        if read_only:
+            return await asyncio.to_thread(run)
+        return await asyncio.wrap_future(self.controller.call(run))
+
+
+def request(method, params=None, port=DEFAULT_PORT, socket_path=None, timeout=10):
+    """Send one request to a running ControlServer and return its result."""
+    if socket_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+    else:
+        sock = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+    with sock, sock.makefile("rwb") as f:
+        f.write(json.dumps({"id": 1, "method": method, "params": params}).encode())
+        f.write(b"\n")
+        f.flush()
+        response = json.loads(f.readline())
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response["result"]
@@ -0,0 +1,48 @@
+from concurrent.futures import Future
+
+from control_server import LogicController
+
+
+class GuiController(LogicController):
+    """Control API requests, run on the Tk thread through the window's handlers.
+
+    Going through the same handlers as the buttons keeps the logic state
+    single-threaded and the buttons and fields in sync with it.
+    """
+
+    def __init__(self, app):
+        super().__init__(app.logic)
+        self.app = app
+
+    def call(self, fn):
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+
+        self.app.bus.call(run)
+        return future
+
+    def start(self, task=None, project=None):
+        if task is not None:
+            self.app.task_name_var.set(task)
+            self.app.project_name_var.set(project or "")
+        self.app.start_timer_gui()
+
+    def pause(self):
+        self.app.pause_timer_gui()
+
+    def stop(self, task=None, project=None):
+        if task is not None:
+            self.app.task_name_var.set(task)
+            self.app.project_name_var.set(project or "")
+        self.app.stop_timer_gui()
+
+    def status(self):
+        # May run off the Tk thread, so read the plain attribute, not the vars
+        status = super().status()
+        status["task"], status["project"] = self.app.tracking
+        return status
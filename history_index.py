@@ -0,0 +1,231 @@
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from operator import le
+
+
+def _text(entry, name):
+    value = entry.get(name)
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _number(entry, name):
+    try:
+        return float(entry.get(name) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _chronological(entry):
+    # One string compares faster than a tuple; "\0" sorts before any time.
+    # Dates and times are ISO strings as saved, so they aren't stripped.
+    day, start = entry.get("date"), entry.get("start_time")
+    return (
+        (day if type(day) is str else "")
+        + "\0"
+        + (start if type(start) is str else "")
+    )
+
+
+# Sortable columns and their keys. Sorts are stable over the chronological
+# order, so rows with equal keys stay in time order.
+SORT_KEYS = {
+    "start": _chronological,
+    "project": lambda e: _text(e, "project").casefold(),
+    "task": lambda e: _text(e, "task").casefold(),
+    "duration": lambda e: _number(e, "duration_seconds"),
+    "break": lambda e: _number(e, "break_seconds"),
+    "earnings": lambda e: _number(e, "earnings"),
+}
+
+
+class _Sorted:
+    """Row numbers ordered by a key, with the keys alongside for bisect."""
+
+    __slots__ = ("keys", "rows")
+
+    def __init__(self, keys=None, rows=None):
+        self.keys = keys if keys is not None else []
+        self.rows = rows if rows is not None else []
+
+    def extend(self, keys, rows):
+        """Add rows: inserted in place if few, else merged with one sort."""
+        if len(rows) <= 64:
+            for key, row in zip(keys, rows):
+                if not self.keys or key >= self.keys[-1]:
+                    self.keys.append(key)
+                    self.rows.append(row)
+                else:
+                    at = bisect_right(self.keys, key)
+                    self.keys.insert(at, key)
+                    self.rows.insert(at, row)
+            return
+        if not self.keys or keys[0] >= self.keys[-1]:
+            if all(map(le, keys, islice(keys, 1, None))):
+                self.keys.extend(keys)  # Already in order: the common case
+                self.rows.extend(rows)
+                return
+        # Stable, and close to linear when both runs are already sorted
+        keys = self.keys + keys
+        rows = self.rows + rows
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.rows = [rows[i] for i in order]
+
+    def date_range(self, date_from, date_to):
+        """Slice bounds of the rows dated within an inclusive range."""
+        lo = bisect_left(self.keys, date_from) if date_from else 0
+        hi = bisect_left(self.keys, date_to + "\1") if date_to else len(self.keys)
+        return lo, max(lo, hi)
+
+
+class HistoryView:
+    """A filtered, sorted window onto the history that is read page by page.
+
+    Holds row numbers only; entries are fetched for the rows asked for.
+    """
+
+    def __init__(self, entries, rows, lo=0, hi=None, descending=False):
+        self.entries = entries
+        self._rows = rows
+        self._lo = lo
+        self._hi = len(rows) if hi is None else hi
+        self.descending = descending
+
+    def __len__(self):
+        return self._hi - self._lo
+
+    def page(self, start, count):
+        """Entries start..start+count of the view, in view order."""
+        start = max(0, min(start, len(self)))
+        stop = min(start + count, len(self))
+        if self.descending:
+            rows = self._rows[self._hi - stop : self._hi - start][::-1]
+        else:
+            rows = self._rows[self._lo + start : self._lo + stop]
+        entries = self.entries
+        return [entries[row] for row in rows]
+
+
+class HistoryIndex:
+    """Indexes over an entry list for browsing it without full rescans.
+
+    Keeps row numbers in chronological order, per project, so a project
+    and date-range filter is a dict lookup plus two bisects. Orders by the
+    other SORT_KEYS columns are built the first time they are asked for,
+    or ahead of time with rows(), sort_rows() and add_order().
+    update() indexes entries appended to the list since the last call: a
+    few are inserted in place, a large batch is merged in one sort. The
+    entry list must only grow at the end while the index is in use.
+    """
+
+    def __init__(self, entries, count=None):
+        self.entries = entries
+        self._all = _Sorted()
+        self._projects = {}
+        self._sorted = {}  # column -> _Sorted over all rows
+        self._indexed = 0
+        self.update(count)
+
+    def __len__(self):
+        return self._indexed
+
+    def update(self, count=None):
+        """Index entries appended since the last call (up to count if given)."""
+        entries = self.entries
+        rows = range(self._indexed, len(entries) if count is None else count)
+        if not rows:
+            return
+        keys = [_chronological(entries[row]) for row in rows]
+        self._all.extend(keys, list(rows))
+        by_project = {}
+        for key, row in zip(keys, rows):
+            project = entries[row].get("project")
+            project = project.strip() if type(project) is str else ""
+            group = by_project.get(project)
+            if group is None:
+                group = by_project[project] = ([], [])
+            group[0].append(key)
+            group[1].append(row)
+        for project, (project_keys, project_rows) in by_project.items():
+            index = self._projects.get(project)
+            if index is None:
+                index = self._projects[project] = _Sorted()
+            index.extend(project_keys, project_rows)
+        if self._sorted:
+            # Added in time order, so rows with equal keys stay in time order
+            added = [row for _, row in sorted(zip(keys, rows))]
+            for column, index in self._sorted.items():
+                key = SORT_KEYS[column]
+                index.extend([key(entries[row]) for row in added], added)
+        self._indexed = rows.stop
+
+    def projects(self):
+        return sorted(project for project in self._projects if project)
+
+    def has_order(self, column):
+        """Whether the unfiltered order by a column is built (start always is)."""
+        return column == "start" or column in self._sorted
+
+    def rows(self):
+        """The chronological row numbers indexed so far, for sort_rows()."""
+        return list(self._all.rows)
+
+    def sort_rows(self, column, rows):
+        """Order rows (from rows()) by a column, for add_order().
+
+        Only reads entries that are already indexed, so it can run without
+        the lock that guards the entry list while saves go on.
+        """
+        key = SORT_KEYS[column]
+        entries = self.entries
+        values = [key(entries[row]) for row in rows]
+        order = sorted(range(len(values)), key=values.__getitem__)
+        return _Sorted([values[i] for i in order], [rows[i] for i in order])
+
+    def add_order(self, column, index, indexed):
+        """Keep an order from sort_rows(); indexed is len() when rows() ran.
+
+        Rows indexed since then are merged in, as update() would have.
+        """
+        if column in self._sorted:
+            return
+        entries = self.entries
+        rows = range(indexed, self._indexed)
+        if rows:
+            keys = [_chronological(entries[row]) for row in rows]
+            added = [row for _, row in sorted(zip(keys, rows))]
+            key = SORT_KEYS[column]
+            index.extend([key(entries[row]) for row in added], added)
+        self._sorted[column] = index
+
+    def _by(self, column):
+        index = self._sorted.get(column)
+        if index is None:
+            index = self._sorted[column] = self.sort_rows(column, self._all.rows)
+        return index
+
+    def view(
+        self, project=None, date_from=None, date_to=None, sort="start", descending=True
+    ):
+        """Rows matching the filters, ordered by a SORT_KEYS column.
+
+        project None means every project. Dates are inclusive "YYYY-MM-DD"
+        bounds. The chronological order and unfiltered column orders are
+        shared with the index; a filtered view sorted by another column
+        sorts just its matches.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort column {sort!r}")
+        if project is None:
+            chronological = self._all
+        else:
+            chronological = self._projects.get(project.strip()) or _Sorted()
+        lo, hi = chronological.date_range(date_from, date_to)
+        if sort == "start":
+            return HistoryView(self.entries, chronological.rows, lo, hi, descending)
+        if project is None and not date_from and not date_to:
+            return HistoryView(self.entries, self._by(sort).rows, 0, None, descending)
+        key = SORT_KEYS[sort]
+        entries = self.entries
+        rows = sorted(chronological.rows[lo:hi], key=lambda row: key(entries[row]))
+        return HistoryView(entries, rows, 0, None, descending)
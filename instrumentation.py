@@ -0,0 +1,159 @@
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+# Bucket i holds latencies below 2**i microseconds (the last one is open)
+BUCKETS = 40
+_DISABLED = nullcontext()
+
+
+class Histogram:
+    """Latency histogram with power-of-two microsecond buckets.
+
+    Fixed size and O(1) to record into; percentiles are read from the
+    bucket bounds, so they are accurate to within a factor of two.
+    """
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = min(int(seconds * 1e6).bit_length(), BUCKETS - 1)
+        self.buckets[index] += 1
+
+    def percentile(self, fraction):
+        """Upper bound (seconds) of the bucket holding the given fraction."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else None,
+            "min_ms": self.min * 1000 if self.min is not None else None,
+            "p50_ms": _ms(self.percentile(0.50)),
+            "p95_ms": _ms(self.percentile(0.95)),
+            "p99_ms": _ms(self.percentile(0.99)),
+            "max_ms": self.max * 1000,
+            # Upper bound in microseconds -> count, for offline analysis
+            "buckets_us": {
+                str(1 << index): count
+                for index, count in enumerate(self.buckets)
+                if count
+            },
+        }
+
+
+def _ms(seconds):
+    return seconds * 1000 if seconds is not None else None
+
+
+class Metrics:
+    """Opt-in latency histograms and counters for hot paths.
+
+    Disabled by default (or enabled with TIME_TRACKER_METRICS=1). While
+    disabled, timed() returns a shared no-op context manager and
+    observe()/count() return after one attribute check, so instrumented
+    code costs next to nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.since = time.time()
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timed(self, name):
+        """Context manager that records the duration of its block under name."""
+        if not self.enabled:
+            return _DISABLED
+        return _Timed(self, name)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.since = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "since": datetime.fromtimestamp(self.since).isoformat(
+                    timespec="seconds"
+                ),
+                "histograms": {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self.histograms.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def export(self, path):
+        """Write the current metrics, with host details, to a JSON file."""
+        report = {
+            "exported": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **self.snapshot(),
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+class _Timed:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+# Shared by the logic, storage and writer layers
+metrics = Metrics(enabled=os.environ.get("TIME_TRACKER_METRICS") == "1")
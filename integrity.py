@@ -0,0 +1,296 @@
+import json
+import math
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+
+from retention import SUMMARY_KEY
+from storage import SqliteStorage, backend_for_path, open_storage
+
+# Fields save_time_entry has always written; break, start/end and earnings
+# came later and may be missing from old entries
+REQUIRED_FIELDS = ("task", "project", "duration_seconds", "date")
+# Longest record looked at before it is reported as damaged
+MAX_RECORD = 1 << 20
+_DAY = re.compile(r"\d{4}-\d{2}-\d{2}$")
+# Where the next array element can start after a damaged one
+_ELEMENT = re.compile(r"[,\[]\s*\{")
+_WHITESPACE = " \t\r\n"
+_SPACE = re.compile(r"[ \t\r\n]*")
+
+
+def check_entry(entry):
+    """What is wrong with an entry, or None if it fits the save_time_entry schema."""
+    if not isinstance(entry, dict):
+        return f"not an object ({type(entry).__name__})"
+    for field in REQUIRED_FIELDS:
+        if field not in entry:
+            return f"missing {field}"
+    for field in ("task", "project"):
+        if type(entry[field]) is not str:
+            return f"{field} is not a string"
+    for field in ("duration_seconds", "break_seconds"):
+        if type(entry.get(field, 0)) is not int:
+            return f"{field} is not a whole number"
+    earnings = entry.get("earnings", 0.0)
+    if type(earnings) not in (int, float) or not math.isfinite(earnings):
+        return "earnings is not a number"
+    for field in ("start_time", "end_time"):
+        if field in entry:
+            try:
+                datetime.fromisoformat(entry[field])
+            except (TypeError, ValueError):
+                return f"{field} is not an ISO timestamp"
+    day = entry["date"]
+    try:
+        if not _DAY.match(day):
+            raise ValueError
+        date.fromisoformat(day)
+    except (TypeError, ValueError):
+        return "date is not a YYYY-MM-DD date"
+    count = entry.get(SUMMARY_KEY)
+    if count is not None and (type(count) is not int or count < 1):
+        return f"{SUMMARY_KEY} is not a positive count"
+    return None
+
+
+def _checked(value):
+    return value, check_entry(value)
+
+
+def _scan_json_array(f, chunk_size=1 << 16):
+    """Yield (offset, entry, problem) for the elements of a JSON array file.
+
+    f is opened in binary mode. The buffer is decoded as latin-1, so string
+    positions are byte offsets; elements with non-ASCII bytes are parsed
+    again as UTF-8. After a damaged element, scanning resumes at the next
+    "{" that follows a comma, so one bad record doesn't hide the rest.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    base = pos = 0  # File offset of buf[0]; position in buf
+    eof = False
+
+    def fill():
+        # Drop what's before pos and read another chunk
+        nonlocal buf, base, pos, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk.decode("latin-1")
+        base += pos
+        pos = 0
+
+    def skip_space():
+        nonlocal pos
+        while True:
+            pos = _SPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return pos < len(buf)
+            fill()
+
+    def resync(start):
+        # Move to the next element start after start; False at end of file
+        nonlocal pos
+        search = start
+        while True:
+            match = _ELEMENT.search(buf, search)
+            if match:
+                pos = match.end() - 1
+                return True
+            if eof:
+                pos = len(buf)
+                return False
+            # Keep a tail so a comma and brace split across reads still match
+            pos = max(0, len(buf) - 64)
+            fill()
+            search = 0
+
+    if not skip_space():
+        return  # Empty file
+    if buf[pos] == "[":
+        pos += 1
+    else:
+        yield base + pos, None, "not a JSON array"
+        if not resync(pos):
+            return
+    first = True
+    while True:
+        if not skip_space():
+            yield base + pos, None, "missing closing ]"
+            return
+        if first and buf[pos] == "]":
+            pos += 1
+            break
+        first = False
+        if not eof and len(buf) - pos < chunk_size:
+            fill()
+        problem = None
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if not eof and len(buf) - pos < MAX_RECORD and _truncated(buf, e):
+                    fill()
+                    continue
+                problem = f"invalid JSON: {e.msg}"
+            break
+        if problem is None and not buf[pos:end].isascii():
+            try:
+                value = json.loads(buf[pos:end].encode("latin-1"))
+            except ValueError as e:
+                problem = f"invalid text: {e}"
+        if problem is not None:
+            yield base + pos, None, problem
+            # Skip the damaged element (a "{" at pos can't match again)
+            if not resync(pos):
+                return
+            continue
+        yield (base + pos, *_checked(value))
+        pos = end
+        if not skip_space():
+            yield base + pos, None, "missing closing ]"
+            return
+        if buf[pos] == ",":
+            pos += 1
+        elif buf[pos] == "]":
+            pos += 1
+            break
+        else:
+            yield base + pos, None, f"expected ',' or ']', got {buf[pos]!r}"
+            if not resync(pos):
+                return
+    if skip_space():
+        yield base + pos, None, "data after the closing ]"
+
+
+def _truncated(buf, error):
+    """Whether decoding failed by running out of buffer, not at a bad character."""
+    if error.msg.startswith("Unterminated string"):
+        # Strings can't hold raw newlines, so one further on means it's damaged
+        return "\n" not in buf[error.pos :]
+    # Otherwise only an error right at the end (in a number, an escape or a
+    # keyword cut short) can be the buffer's fault
+    return len(buf[error.pos :].rstrip(_WHITESPACE)) < 16
+
+
+def _scan_journal(f):
+    """Yield (offset, entry, problem) for the lines of a JSON Lines file."""
+    offset = 0
+    while True:
+        line = f.readline(MAX_RECORD)
+        if not line:
+            return
+        start = offset
+        offset += len(line)
+        if not line.endswith(b"\n") and len(line) == MAX_RECORD:
+            # Skip the rest of an overlong line without holding it
+            while (rest := f.readline(MAX_RECORD)) and not rest.endswith(b"\n"):
+                offset += len(rest)
+            offset += len(rest)
+            yield start, None, "line too long"
+            continue
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            if line.endswith(b"\n"):
+                yield start, None, f"invalid JSON: {getattr(e, 'msg', e)}"
+            else:
+                yield start, None, "torn final line"
+            continue
+        yield (start, *_checked(value))
+
+
+def _scan_sqlite(path):
+    """Yield (row id, entry, problem) for the rows of a SQLite store."""
+    if not os.path.exists(path):
+        return
+    conn = sqlite3.connect(path)
+    row_id = 0
+    try:
+        # Databases from before summaries lack that column
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+        columns = [field for field in SqliteStorage.COLUMNS if field in existing]
+        cursor = conn.execute(
+            f"SELECT id, {', '.join(columns)} FROM entries ORDER BY id"
+        )
+        while rows := cursor.fetchmany(1000):
+            for row_id, *values in rows:
+                entry = {
+                    field: value
+                    for field, value in zip(columns, values)
+                    if value is not None
+                }
+                yield (row_id, *_checked(entry))
+    except sqlite3.DatabaseError as e:
+        yield row_id, None, f"database error: {e}"
+    finally:
+        conn.close()
+
+
+def scan_records(path):
+    """Yield (file, offset, entry, problem) for every record of a data file.
+
+    Streams the file, so memory use doesn't grow with its size. offset is
+    the record's byte offset in file (the row id for SQLite). problem is
+    None for a good record, which comes with its entry; a damaged one
+    comes with entry None or the entry that failed check_entry().
+    Partitioned stores are scanned shard by shard.
+    """
+    kind = backend_for_path(path)
+    if kind == "sqlite":
+        for offset, entry, problem in _scan_sqlite(path):
+            yield path, offset, entry, problem
+        return
+    if kind == "partitioned":
+        storage = open_storage(path)
+        files = [
+            os.path.join(storage.path, f"{month}.jsonl") for month in storage.months()
+        ]
+        scan = _scan_journal
+    else:
+        files = [path] if os.path.exists(path) else []
+        scan = _scan_journal if kind == "journal" else _scan_json_array
+    for name in files:
+        with open(name, "rb") as f:
+            for offset, entry, problem in scan(f):
+                yield name, offset, entry, problem
+
+
+def check_data_file(path, repair_to=None, on_problem=None):
+    """Validate every record of a data file, optionally writing the good ones.
+
+    on_problem(file, offset, problem) is called for each damaged record.
+    With repair_to (a path, whose extension picks the format), the good
+    records are streamed into a new file there; the original is never
+    changed. Returns {"checked", "bad", "kept"}.
+    """
+    stats = {"checked": 0, "bad": 0, "kept": 0}
+    if repair_to is not None and os.path.abspath(
+        repair_to.rstrip("/\\")
+    ) == os.path.abspath(path.rstrip("/\\")):
+        raise ValueError("Write the repaired copy to a different path")
+
+    def good():
+        for name, offset, entry, problem in scan_records(path):
+            stats["checked"] += 1
+            if problem is None:
+                stats["kept"] += 1
+                yield entry
+            else:
+                stats["bad"] += 1
+                if on_problem:
+                    on_problem(name, offset, problem)
+
+    if repair_to is None:
+        for _ in good():
+            pass
+        return stats
+    target = open_storage(repair_to)
+    try:
+        target.write_all(good())
+    finally:
+        target.close()
+    return stats
@@ -1,13 +1,41 @@
+import time
+
+# Start of the --profile-startup clock, taken before the other imports
+_STARTED = time.perf_counter()
+
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from datetime import datetime
+from tkinter import ttk  # messagebox and filedialog are imported when first used
 import json
 import os
+import sys
+import threading
+from autocomplete import Autocomplete
+from instrumentation import metrics
 from tracker_logic import TimeTrackerLogic  # Import the new logic module
+from ui_bus import UiEventBus
+from retention import SUMMARY_KEY, archive_path
+from storage import backend_for_path, path_for_backend
+
+_IMPORTED = time.perf_counter()
+
+# Storage format labels shown in the settings dialog
+STORAGE_FORMATS = {
+    "JSON file": "json",
+    "JSON Lines journal": "journal",
+    "SQLite database": "sqlite",
+    "Monthly partitions (folder)": "partitioned",
+}
 
 
 class TimeTracker:
-    def __init__(self):
+    def __init__(self, profile_startup=False, control_port=None, control_socket=None):
+        # Startup phases as (name, seconds, seconds since start), for
+        # --profile-startup
+        self.profile_startup = profile_startup
+        self.startup_phases = [("imports", _IMPORTED - _STARTED, _IMPORTED - _STARTED)]
+        self._phase_start = _IMPORTED
+
         self.root = tk.Tk()
         self.root.title("Time Tracker")
         self.root.geometry("370x460")  # Larger to fit earnings meter
@@ -21,16 +49,44 @@ class TimeTracker:
         self.status_var = tk.StringVar(value="Ready to track time")
         self.hourly_rate_var = tk.DoubleVar(value=0.0)
         self.earnings_var = tk.StringVar(value="$0.0000")
+        # Earnings saved today plus the running session, to the cent
+        self.today_var = tk.StringVar(value="Today: $0.00")
+        self._today_saved = 0.0
+        self._shown_today = None
+        # (task, project) of the running session, for the control API
+        self.tracking = ("", "")
+
+        # Earnings meter refresh: animates at meter_fps only while the timer
+        # runs, and only touches widgets whose rendered value changed
+        self.meter_fps = 20
+        self._meter_job = None
+        self._shown_earnings = None
+        self._shown_meter = None
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+        # Open history window and its refresh function, if any
+        self._history_window = None
+        self._history_refresh = None
+
+        # Logic callbacks fire on the clock, writer and loader threads; they
+        # only post here, and the Tk loop applies the updates in batches
+        self.bus = UiEventBus(self.root)
+        self.bus.subscribe("time", self.time_var.set)
+        self.bus.subscribe("status", self.status_var.set)
+        self.bus.subscribe("data_changed", lambda change: self._refresh_from_data())
 
-        # Initialize the core logic
-        self.logic = TimeTrackerLogic()
+        # Initialize the core logic; history is loaded once the window is up
+        self.logic = TimeTrackerLogic(autoload=False)
         self.logic.set_callbacks(
-            update_time_cb=lambda time_str: self.root.after(
-                0, self.time_var.set, time_str
+            update_time_cb=lambda time_str: self.bus.post("time", time_str),
+            update_status_cb=lambda text: self.bus.post("status", text),
+            show_warning_cb=lambda title, message: self.bus.call(
+                self._show_warning, title, message
             ),
-            update_status_cb=self.status_var.set,
-            show_warning_cb=messagebox.showwarning,
-            show_error_cb=messagebox.showerror,
+            show_error_cb=lambda title, message: self.bus.call(
+                self._show_error, title, message
+            ),
+            data_changed_cb=lambda change: self.bus.post("data_changed", change),
         )
 
         # Load user settings (e.g., data file path) before building UI widgets that may depend on it
@@ -38,10 +94,137 @@ class TimeTracker:
             os.path.expanduser("~"), ".time_tracker_settings.json"
         )
         self._load_user_settings()
+        self._phase("settings")
 
         self.setup_ui()
-        # Start earnings/meter animation loop
-        self._schedule_earnings_update()
+        # Draw the idle meter once; it animates only while the timer runs
+        self._wake_meter()
+        self._phase("window built")
+        self._first_paint = self.root.bind("<Map>", self._on_first_paint, "+")
+
+        # Read the history in the background; the project list and the data
+        # file watcher start when it is ready
+        self._watch_job = None
+        self.status_var.set("Loading history…")
+        self.logic.load_data_async(on_done=self._warm_data)
+        self.bus.start()
+
+        # Optional local control API for scripts and editor/git hooks
+        self.control_server = None
+        if control_port is not None or control_socket:
+            # Imported only when enabled: asyncio and ssl slow down startup
+            from control_server import ControlServer
+            from gui_controller import GuiController
+
+            server = ControlServer(
+                GuiController(self), port=control_port or 0, socket_path=control_socket
+            )
+            try:
+                server.start()
+                self.control_server = server
+                where = control_socket or f"127.0.0.1:{server.port}"
+                print(f"Control API listening on {where}", file=sys.stderr)
+            except Exception as e:
+                print(f"Control server not started: {e}", file=sys.stderr)
+
+    def _phase(self, name, seconds=None):
+        now = time.perf_counter()
+        if seconds is None:
+            seconds = now - self._phase_start
+        self._phase_start = now
+        self.startup_phases.append((name, seconds, now - _STARTED))
+
+    def _on_first_paint(self, event):
+        self.root.unbind("<Map>", self._first_paint)
+        self._phase("first paint")
+        self._finish_profile()
+
+    def _warm_data(self):
+        # Runs on the loader thread: build the running totals and name
+        # indexes here, so the first refresh and keystroke don't wait for them
+        self.logic.warm_up()
+        self.bus.call(self._on_data_loaded)
+
+    def _on_data_loaded(self):
+        self._phase("data load", self.logic.last_load_seconds)
+        if self.status_var.get() == "Loading history…":
+            self.status_var.set("Ready to track time")
+        started = time.perf_counter()
+        self._refresh_projects()
+        self._phase("project list", time.perf_counter() - started)
+        self._refresh_today()
+        # Pick up entries other instances add to a shared data file
+        self._watch_job = self.root.after(
+            int(self.logic.watch_interval * 1000), self._watch_data_file
+        )
+        self._finish_profile()
+        if self.logic.recovered_session and not self.profile_startup:
+            self._offer_recovery()
+
+    def _offer_recovery(self):
+        """Ask what to do with a session the last run didn't finish."""
+        from tkinter import messagebox
+
+        info = self.logic.recovered_session
+        started = time.strftime(
+            "%Y-%m-%d %H:%M", time.localtime(info["session_start"])
+        )
+        tracked = self.logic.format_elapsed(info["tracked"])
+        name = info["task"]
+        if info["project"]:
+            name += f" (Project: {info['project']})"
+        answer = messagebox.askyesnocancel(
+            "Unfinished session",
+            f"{name} was still being tracked when the app last closed "
+            f"({tracked} tracked since {started}).\n\n"
+            "Yes: resume it (the time since counts as break)\n"
+            "No: save it as an entry\n"
+            "Cancel: discard it",
+        )
+        if answer is None:
+            self.logic.discard_recovered()
+        elif not answer:
+            try:
+                self.logic.set_hourly_rate(self.hourly_rate_var.get())
+            except Exception:
+                self.logic.set_hourly_rate(0.0)
+            self.logic.save_recovered()
+            self._refresh_from_data()
+        elif self.logic.resume_recovered():
+            self.task_name_var.set(info["task"])
+            self.project_name_var.set(info["project"])
+            self.tracking = (info["task"], info["project"])
+            if self.logic.is_paused:
+                self.start_btn.config(state=tk.NORMAL, text="Resume")
+                self.pause_btn.config(state=tk.DISABLED)
+            else:
+                self.start_btn.config(state=tk.DISABLED, text="Start")
+                self.pause_btn.config(state=tk.NORMAL)
+            self.stop_btn.config(state=tk.NORMAL)
+            self._wake_meter()
+
+    def _finish_profile(self):
+        """With --profile-startup, print the report and quit once all phases ran."""
+        names = {name for name, _, _ in self.startup_phases}
+        if not self.profile_startup or not {"first paint", "project list"} <= names:
+            return
+        print(f"{'phase':<14} {'ms':>9} {'since start':>12}", file=sys.stderr)
+        for name, seconds, since_start in self.startup_phases:
+            print(
+                f"{name:<14} {seconds * 1000:9.1f} {since_start * 1000:12.1f}",
+                file=sys.stderr,
+            )
+        self.root.after(0, self.root.destroy)
+
+    def _show_warning(self, title, message):
+        from tkinter import messagebox
+
+        messagebox.showwarning(title, message)
+
+    def _show_error(self, title, message):
+        from tkinter import messagebox
+
+        messagebox.showerror(title, message)
 
     def setup_ui(self):
         # Main frame
@@ -60,9 +243,9 @@ class TimeTracker:
         ttk.Label(main_frame, text="Task Name:").grid(
             row=0, column=0, sticky=tk.EW, pady=(0, 5)
         )
-        ttk.Entry(main_frame, textvariable=self.task_name_var, width=30).grid(
-            row=1, column=0, columnspan=2, sticky=(tk.EW), pady=(0, 10)
-        )
+        task_entry = ttk.Entry(main_frame, textvariable=self.task_name_var, width=30)
+        task_entry.grid(row=1, column=0, columnspan=2, sticky=(tk.EW), pady=(0, 10))
+        self.task_autocomplete = Autocomplete(task_entry, self.logic.complete_tasks)
 
         # Project name input
         ttk.Label(main_frame, text="Project Name:").grid(
@@ -76,6 +259,9 @@ class TimeTracker:
         )
         self.project_combobox["values"] = self.logic.get_unique_projects()
         self.project_combobox.set("")
+        self.project_autocomplete = Autocomplete(
+            self.project_combobox, self.logic.complete_projects
+        )
 
         # Time display
         time_frame = ttk.Frame(main_frame)
@@ -95,6 +281,7 @@ class TimeTracker:
             font=("Helvetica", 18, "bold"),
             foreground="#2a9d8f",
         ).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Label(earnings_frame, textvariable=self.today_var).pack(side=tk.RIGHT)
 
         # Smooth progress meter (fills over each minute)
         meter_frame = ttk.Frame(main_frame)
@@ -134,6 +321,9 @@ class TimeTracker:
             main_frame, text="Settings", command=self.open_settings_dialog
         )
         self.settings_btn.grid(row=9, column=1, sticky=tk.E, pady=(5, 0))
+        ttk.Button(main_frame, text="History", command=self.open_history_window).grid(
+            row=9, column=0, sticky=tk.W, pady=(5, 0)
+        )
 
     def start_timer_gui(self):
         task_name = self.task_name_var.get()
@@ -149,12 +339,14 @@ class TimeTracker:
 
         # Update GUI based on logic state
         if self.logic.is_running:
+            self.tracking = (task_name.strip(), project_name.strip())
             self.start_btn.config(state=tk.DISABLED)
             self.pause_btn.config(state=tk.NORMAL)
             self.stop_btn.config(state=tk.NORMAL)
             self.start_btn.config(text="Start")
         elif self.logic.is_paused:
             pass
+        self._wake_meter()
 
     def pause_timer_gui(self):
         self.logic.pause_timer()
@@ -164,6 +356,7 @@ class TimeTracker:
             self.start_btn.config(state=tk.NORMAL, text="Resume")
             self.pause_btn.config(state=tk.DISABLED)
             self.stop_btn.config(state=tk.NORMAL)
+        self._wake_meter()
 
     def stop_timer_gui(self):
         task_name = self.task_name_var.get()
@@ -179,50 +372,90 @@ class TimeTracker:
 
         # Update GUI based on logic state
         if not self.logic.is_running:
+            self.tracking = ("", "")
             self.time_var.set("00:00:00")
             self.start_btn.config(state=tk.NORMAL, text="Start")
             self.pause_btn.config(state=tk.DISABLED)
             self.stop_btn.config(state=tk.DISABLED)
-            self.earnings_var.set("$0.0000")
+            self._refresh_from_data()
+            self._wake_meter()
             # Optionally clear fields
             # self.task_name_var.set("")
             # self.project_name_var.set("")
 
-    def _schedule_earnings_update(self):
-        """High-frequency UI update for earnings and meter (smooth increments)."""
-        try:
-            rate = float(self.hourly_rate_var.get() or 0.0)
-        except Exception:
-            rate = 0.0
+    def _wake_meter(self):
+        """Render the meter now and keep animating it if the timer is running."""
+        if self._meter_job is not None:
+            self.root.after_cancel(self._meter_job)
+            self._meter_job = None
+        self._schedule_earnings_update()
 
-        # Compute elapsed seconds precisely from logic state
-        elapsed_seconds = 0.0
-        if self.logic.is_running:
-            if self.logic.is_paused:
-                elapsed_seconds = self.logic.elapsed_time.total_seconds()
-            else:
-                elapsed_seconds = (
-                    self.logic.elapsed_time.total_seconds()
-                    + (datetime.now() - self.logic.start_time).total_seconds()
-                )
-        else:
-            # Not running; logic may have reset elapsed_time
-            elapsed_seconds = (
-                self.logic.elapsed_time.total_seconds()
-                if getattr(self.logic, "elapsed_time", None)
-                else 0.0
+    def _schedule_earnings_update(self):
+        """Frame loop for earnings and meter; idles completely when not running."""
+        self._meter_job = None
+        self._render_meter()
+        if self.logic.is_running and not self.logic.is_paused:
+            self._meter_job = self.root.after(
+                max(1, int(1000 / self.meter_fps)), self._schedule_earnings_update
             )
 
-        earned = (elapsed_seconds / 3600.0) * rate
+    def _render_meter(self):
+        # Compute elapsed seconds precisely from logic state (monotonic clock)
+        elapsed_seconds = self.logic.current_elapsed().total_seconds()
+
+        # The logic's rate is kept in sync with hourly_rate_var, and reading
+        # it avoids a Tcl round trip per frame
+        earned = (elapsed_seconds / 3600.0) * self.logic.hourly_rate
         # Show 4 decimals and a dollar sign
-        self.earnings_var.set(f"${earned:.4f}")
+        earnings_text = f"${earned:.4f}"
 
-        # Meter: fill 0-100 over each minute for a lively animation
-        minute_fraction = (elapsed_seconds % 60.0) / 60.0
-        self.meter["value"] = minute_fraction * 100.0
+        # Meter: fill 0-100 over each minute; 0.1 steps are finer than a pixel
+        meter_value = round((elapsed_seconds % 60.0) / 60.0 * 100.0, 1)
 
-        # Re-run ~20 times per second for smoothness
-        self.root.after(50, self._schedule_earnings_update)
+        # Today's saved total is cached, so this is one add and compare
+        today_cents = int((self._today_saved + earned) * 100)
+        changed = False
+        if today_cents != self._shown_today:
+            self._shown_today = today_cents
+            self.today_var.set(f"Today: ${today_cents / 100:.2f}")
+            changed = True
+        if earnings_text != self._shown_earnings:
+            self._shown_earnings = earnings_text
+            self.earnings_var.set(earnings_text)
+            changed = True
+        if meter_value != self._shown_meter:
+            self._shown_meter = meter_value
+            self.meter["value"] = meter_value
+            changed = True
+        if changed:
+            self.frames_rendered += 1
+        else:
+            self.frames_skipped += 1
+
+    def _watch_data_file(self):
+        if not self.logic.poll_changes():
+            self._refresh_today()  # Cheap lookup; also rolls over at midnight
+        self._watch_job = self.root.after(
+            int(self.logic.watch_interval * 1000), self._watch_data_file
+        )
+
+    def _refresh_projects(self):
+        self.project_combobox["values"] = self.logic.get_unique_projects()
+
+    def _refresh_today(self):
+        """Re-read today's saved earnings from the logic's running totals."""
+        # Never waits for the totals to be built: after a reload they are
+        # built in the background, and data_changed brings us back here
+        totals = self.logic.today_totals(wait=False)
+        if totals is not None:
+            self._today_saved = totals["earnings"]
+        self._render_meter()
+
+    def _refresh_from_data(self):
+        self._refresh_projects()
+        self._refresh_today()
+        if self._history_refresh is not None:
+            self._history_refresh()
 
     # -------------------- Settings handling --------------------
     def _load_user_settings(self):
@@ -232,7 +465,8 @@ class TimeTracker:
                     settings = json.load(f)
                 data_file = settings.get("data_file")
                 if data_file:
-                    self.logic.set_data_file(data_file)
+                    # Loaded in the background after the window appears
+                    self.logic.set_data_file(data_file, load=False)
                 rate = settings.get("hourly_rate")
                 if rate is not None:
                     try:
@@ -241,6 +475,26 @@ class TimeTracker:
                         self.logic.set_hourly_rate(rate_f)
                     except Exception:
                         pass
+                if settings.get("instrumentation"):
+                    metrics.enabled = True
+                interval = settings.get("checkpoint_interval")
+                if interval is not None:
+                    try:
+                        self.logic.checkpoint_interval = max(0.0, float(interval))
+                    except Exception:
+                        pass
+                days = settings.get("retention_days")
+                if days is not None:
+                    try:
+                        self.logic.retention_days = max(1, int(days))
+                    except Exception:
+                        pass
+                fps = settings.get("meter_fps")
+                if fps is not None:
+                    try:
+                        self.meter_fps = min(60, max(1, int(fps)))
+                    except Exception:
+                        pass
         except Exception as e:
             # Show non-blocking error, but proceed with defaults
             print(f"Failed to load settings: {e}")
@@ -250,13 +504,19 @@ class TimeTracker:
             settings = {
                 "data_file": getattr(self.logic, "data_file", None),
                 "hourly_rate": float(self.hourly_rate_var.get() or 0.0),
+                "meter_fps": self.meter_fps,
+                "instrumentation": metrics.enabled,
+                "retention_days": self.logic.retention_days,
+                "checkpoint_interval": self.logic.checkpoint_interval,
             }
             with open(self.settings_path, "w") as f:
                 json.dump(settings, f, indent=2)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save settings: {e}")
+            self._show_error("Error", f"Failed to save settings: {e}")
 
     def open_settings_dialog(self):
+        from tkinter import filedialog, messagebox
+
         dialog = tk.Toplevel(self.root)
         dialog.title("Settings")
         dialog.transient(self.root)
@@ -285,7 +545,12 @@ class TimeTracker:
                 parent=dialog,
                 title="Choose data file",
                 defaultextension=".json",
-                filetypes=[["JSON files", "*.json"], ["All files", "*.*"]],
+                filetypes=[
+                    ["JSON files", "*.json"],
+                    ["JSON Lines journal", "*.jsonl"],
+                    ["SQLite database", "*.db"],
+                    ["All files", "*.*"],
+                ],
                 initialdir=initialdir,
                 initialfile=(
                     os.path.basename(path_var.get())
@@ -299,24 +564,178 @@ class TimeTracker:
         browse_btn = ttk.Button(frm, text="Browse…", command=browse)
         browse_btn.grid(row=1, column=2, padx=(5, 0))
 
+        # Storage format; switching it migrates the current history into a
+        # file of the new kind next to the chosen path
+        ttk.Label(frm, text="Storage format:").grid(
+            row=2, column=0, sticky=tk.W, pady=(10, 5)
+        )
+        current_kind = backend_for_path(path_var.get())
+        storage_var = tk.StringVar(
+            value=next(
+                label for label, kind in STORAGE_FORMATS.items() if kind == current_kind
+            )
+        )
+        ttk.Combobox(
+            frm,
+            textvariable=storage_var,
+            values=list(STORAGE_FORMATS),
+            state="readonly",
+            width=22,
+        ).grid(row=3, column=0, sticky=tk.W)
+
         # Hourly rate
         ttk.Label(frm, text="Hourly rate ($/hr):").grid(
-            row=2, column=0, sticky=tk.W, pady=(10, 5)
+            row=4, column=0, sticky=tk.W, pady=(10, 5)
         )
         rate_var = tk.StringVar(value=str(self.hourly_rate_var.get() or 0.0))
         rate_entry = ttk.Entry(frm, textvariable=rate_var, width=20)
-        rate_entry.grid(row=3, column=0, sticky=tk.W)
+        rate_entry.grid(row=5, column=0, sticky=tk.W)
+
+        # Earnings meter frame rate while the timer runs
+        ttk.Label(frm, text="Meter refresh (fps):").grid(
+            row=4, column=1, sticky=tk.W, pady=(10, 5)
+        )
+        fps_var = tk.StringVar(value=str(self.meter_fps))
+        ttk.Entry(frm, textvariable=fps_var, width=8).grid(row=5, column=1, sticky=tk.W)
+
+        # How often a running session is saved for crash recovery
+        ttk.Label(frm, text="Checkpoint every (s):").grid(
+            row=4, column=2, sticky=tk.W, pady=(10, 5)
+        )
+        checkpoint_var = tk.StringVar(value=f"{self.logic.checkpoint_interval:g}")
+        ttk.Entry(frm, textvariable=checkpoint_var, width=8).grid(
+            row=5, column=2, sticky=tk.W
+        )
+
+        # Retention: fold old entries into one summary per day and project
+        retention = ttk.Frame(frm)
+        retention.grid(row=6, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        ttk.Label(retention, text="Summarize entries older than").pack(side=tk.LEFT)
+        retention_var = tk.StringVar(value=str(self.logic.retention_days))
+        ttk.Entry(retention, textvariable=retention_var, width=6).pack(
+            side=tk.LEFT, padx=5
+        )
+        ttk.Label(retention, text="days").pack(side=tk.LEFT)
+        archive_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(retention, text="Archive originals", variable=archive_var).pack(
+            side=tk.LEFT, padx=(10, 0)
+        )
+
+        def parse_retention():
+            try:
+                days = int(retention_var.get().strip())
+                if days < 1:
+                    raise ValueError
+                return days
+            except ValueError:
+                messagebox.showwarning(
+                    "Warning", "Please enter a whole number of days", parent=dialog
+                )
+                return None
+
+        def summarize():
+            days = parse_retention()
+            if days is None:
+                return
+            if archive_var.get():
+                archive = archive_path(self.logic.data_file)
+                kept = f"The originals are kept in\n{archive}"
+            else:
+                kept = "The originals are deleted."
+            if not messagebox.askyesno(
+                "Summarize history",
+                f"Replace entries older than {days} days with one summary per day "
+                f"and project? Reports keep the same totals. {kept}",
+                parent=dialog,
+            ):
+                return
+            stats = self.logic.summarize_history(days, archive_var.get())
+            if stats is None:
+                return
+            self.logic.retention_days = days
+            self._save_user_settings()
+            self._refresh_from_data()
+            messagebox.showinfo(
+                "Summarize history",
+                f"Folded {stats['folded']} entries into "
+                f"{stats['summaries']} day summaries",
+                parent=dialog,
+            )
+
+        ttk.Button(retention, text="Summarize now", command=summarize).pack(
+            side=tk.LEFT, padx=(10, 0)
+        )
+
+        # JSON import/export
+        transfer = ttk.Frame(frm)
+        transfer.grid(row=7, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+
+        def import_json():
+            file_path = filedialog.askopenfilename(
+                parent=dialog,
+                title="Import entries",
+                filetypes=[["JSON files", "*.json"], ["All files", "*.*"]],
+            )
+            if not file_path:
+                return
+            count = self.logic.import_data_file(file_path)
+            if count is not None:
+                self._refresh_from_data()
+                messagebox.showinfo(
+                    "Import", f"Imported {count} entries", parent=dialog
+                )
+
+        def export_json():
+            file_path = filedialog.asksaveasfilename(
+                parent=dialog,
+                title="Export entries",
+                defaultextension=".json",
+                filetypes=[["JSON files", "*.json"], ["All files", "*.*"]],
+                initialfile="time_tracker_export.json",
+            )
+            if not file_path:
+                return
+            count = self.logic.export_data_file(file_path)
+            if count is not None:
+                messagebox.showinfo(
+                    "Export", f"Exported {count} entries", parent=dialog
+                )
+
+        ttk.Button(transfer, text="Import JSON…", command=import_json).pack(
+            side=tk.LEFT
+        )
+        ttk.Button(transfer, text="Export JSON…", command=export_json).pack(
+            side=tk.LEFT, padx=(5, 0)
+        )
+        ttk.Button(
+            transfer,
+            text="Diagnostics…",
+            command=lambda: self.open_diagnostics_window(dialog),
+        ).pack(side=tk.LEFT, padx=(5, 0))
 
         # Buttons
         btns = ttk.Frame(frm)
-        btns.grid(row=4, column=0, columnspan=3, sticky=tk.E, pady=(10, 0))
+        btns.grid(row=8, column=0, columnspan=3, sticky=tk.E, pady=(10, 0))
 
         def on_ok():
             chosen = path_var.get().strip()
             if not chosen:
                 messagebox.showwarning("Warning", "Please enter a valid path")
                 return
-            self.logic.set_data_file(chosen)
+            target = path_for_backend(chosen, STORAGE_FORMATS[storage_var.get()])
+            if target != chosen and not os.path.exists(target):
+                if not messagebox.askyesno(
+                    "Storage format",
+                    f"Copy all entries into\n{target}\nand use it from now on? "
+                    "The current file is kept as a backup.",
+                    parent=dialog,
+                ):
+                    return
+                if not self.logic.convert_data_file(target):
+                    return
+            else:
+                self.logic.set_data_file(target)
+            self._refresh_from_data()
             # Validate and save hourly rate
             try:
                 rate_val = float(rate_var.get().strip() or 0.0)
@@ -329,6 +748,32 @@ class TimeTracker:
                     "Warning", "Please enter a valid non-negative hourly rate"
                 )
                 return
+            try:
+                fps_val = int(fps_var.get().strip())
+                if not 1 <= fps_val <= 60:
+                    raise ValueError
+                self.meter_fps = fps_val
+            except Exception:
+                messagebox.showwarning(
+                    "Warning", "Please enter a meter refresh between 1 and 60 fps"
+                )
+                return
+            try:
+                interval = float(checkpoint_var.get().strip())
+                if interval < 0:
+                    raise ValueError
+                self.logic.checkpoint_interval = interval
+            except Exception:
+                messagebox.showwarning(
+                    "Warning", "Please enter a checkpoint interval (0 turns it off)"
+                )
+                return
+            days = parse_retention()
+            if days is None:
+                return
+            self.logic.retention_days = days
+            # Re-render with the new rate, even while paused
+            self._wake_meter()
             self._save_user_settings()
             dialog.destroy()
 
@@ -337,12 +782,360 @@ class TimeTracker:
         )
         ttk.Button(btns, text="OK", command=on_ok).pack(side=tk.RIGHT)
 
+    def open_history_window(self):
+        """Browse saved entries with sort and project/date filters.
+
+        The list is virtual: the Treeview only ever holds one screenful of
+        rows, and scrolling refills them from an indexed view of the
+        history, so opening and scrolling cost the same for any size.
+        """
+        from datetime import date
+        from tkinter import messagebox
+
+        if self._history_window is not None and self._history_window.winfo_exists():
+            self._history_window.lift()
+            return
+        window = self._history_window = tk.Toplevel(self.root)
+        window.title("History")
+        window.geometry("760x460")
+
+        frm = ttk.Frame(window, padding=10)
+        frm.grid(row=0, column=0, sticky=tk.NSEW)
+        window.grid_columnconfigure(0, weight=1)
+        window.grid_rowconfigure(0, weight=1)
+        frm.grid_columnconfigure(0, weight=1)
+        frm.grid_rowconfigure(1, weight=1)
+
+        all_projects = "All projects"
+        project_var = tk.StringVar(value=all_projects)
+        from_var = tk.StringVar()
+        to_var = tk.StringVar()
+        count_var = tk.StringVar()
+
+        filters = ttk.Frame(frm)
+        filters.grid(row=0, column=0, columnspan=2, sticky=tk.EW, pady=(0, 8))
+        ttk.Label(filters, text="Project:").pack(side=tk.LEFT)
+        project_box = ttk.Combobox(
+            filters,
+            textvariable=project_var,
+            values=[all_projects],
+            state="readonly",
+            width=22,
+        )
+        project_box.pack(side=tk.LEFT, padx=(5, 10))
+        ttk.Label(filters, text="From:").pack(side=tk.LEFT)
+        from_entry = ttk.Entry(filters, textvariable=from_var, width=11)
+        from_entry.pack(side=tk.LEFT, padx=(5, 10))
+        ttk.Label(filters, text="To:").pack(side=tk.LEFT)
+        to_entry = ttk.Entry(filters, textvariable=to_var, width=11)
+        to_entry.pack(side=tk.LEFT, padx=(5, 10))
+        ttk.Label(filters, textvariable=count_var, foreground="gray").pack(
+            side=tk.RIGHT
+        )
+
+        columns = ("start", "project", "task", "duration", "break", "earnings")
+        headings = {
+            "start": "Start",
+            "project": "Project",
+            "task": "Task",
+            "duration": "Duration",
+            "break": "Break",
+            "earnings": "Earnings",
+        }
+        visible = 18
+        tree = ttk.Treeview(
+            frm, columns=columns, show="headings", height=visible, selectmode="browse"
+        )
+        for column, width in zip(columns, (130, 130, 220, 75, 75, 80)):
+            numeric = column in ("duration", "break", "earnings")
+            tree.column(column, width=width, anchor=tk.E if numeric else tk.W)
+        tree.grid(row=1, column=0, sticky=tk.NSEW)
+        scrollbar = ttk.Scrollbar(frm, orient=tk.VERTICAL)
+        scrollbar.grid(row=1, column=1, sticky=tk.NS)
+
+        # The only items the tree ever has; detached when the view is shorter
+        items = [tree.insert("", tk.END) for _ in range(visible)]
+        state = {"view": None, "top": 0, "sort": "start", "descending": True}
+
+        def row_values(entry):
+            count = entry.get(SUMMARY_KEY)
+            if count:
+                # A day summary: show the day and how many entries it holds
+                start = str(entry.get("date") or "")
+                task = f"({count} entries)"
+            else:
+                start = str(entry.get("start_time") or entry.get("date") or "")[:16]
+                task = entry.get("task", "")
+            return (
+                start.replace("T", " "),
+                entry.get("project", ""),
+                task,
+                self.logic.format_elapsed(entry.get("duration_seconds") or 0),
+                self.logic.format_elapsed(entry.get("break_seconds") or 0),
+                f"${float(entry.get('earnings') or 0):.2f}",
+            )
+
+        def render():
+            view, top = state["view"], state["top"]
+            entries = view.page(top, visible)
+            for index, item in enumerate(items):
+                if index < len(entries):
+                    tree.item(item, values=row_values(entries[index]))
+                    tree.move(item, "", index)
+                else:
+                    tree.detach(item)
+            total = len(view)
+            if total:
+                scrollbar.set(top / total, min(1.0, (top + visible) / total))
+            else:
+                scrollbar.set(0.0, 1.0)
+
+        def scroll_to(top):
+            if state["view"] is None:
+                return  # Still indexing
+            state["top"] = max(0, min(int(top), len(state["view"]) - visible))
+            render()
+
+        def on_scrollbar(action, amount, unit=None):
+            if state["view"] is None:
+                return
+            if action == "moveto":
+                scroll_to(float(amount) * len(state["view"]))
+            else:
+                step = visible - 1 if unit == "pages" else 1
+                scroll_to(state["top"] + int(amount) * step)
+
+        def on_wheel(event):
+            if event.num == 4 or event.delta > 0:
+                scroll_to(state["top"] - 3)
+            else:
+                scroll_to(state["top"] + 3)
+            return "break"
+
+        scrollbar.config(command=on_scrollbar)
+        tree.bind("<MouseWheel>", on_wheel)
+        tree.bind("<Button-4>", on_wheel)
+        tree.bind("<Button-5>", on_wheel)
+        tree.bind("<Prior>", lambda e: scroll_to(state["top"] - visible + 1))
+        tree.bind("<Next>", lambda e: scroll_to(state["top"] + visible - 1))
+
+        def parse_date(text):
+            text = text.strip()
+            if text:
+                date.fromisoformat(text)  # Raises ValueError if malformed
+            return text or None
+
+        def load(keep_position=False):
+            try:
+                date_from = parse_date(from_var.get())
+                date_to = parse_date(to_var.get())
+            except ValueError:
+                messagebox.showwarning(
+                    "History", "Dates must look like 2024-01-31", parent=window
+                )
+                return
+            project = project_var.get()
+            state["view"] = self.logic.history(
+                None if project == all_projects else project,
+                date_from,
+                date_to,
+                state["sort"],
+                state["descending"],
+            )
+            count_var.set(f"{len(state['view']):,} entries")
+            scroll_to(state["top"] if keep_position else 0)
+
+        def sort_by(column):
+            if state["sort"] == column:
+                state["descending"] = not state["descending"]
+            else:
+                # Newest, longest and best paid first; names A-Z
+                state["sort"] = column
+                state["descending"] = column not in ("project", "task")
+            show_headings()
+            if column == "start":
+                load()
+                return
+            # The first sort by a column orders the whole history, which can
+            # take a while, so it is built off the Tk thread like the index
+            count_var.set("Sorting…")
+            threading.Thread(
+                target=lambda: (
+                    self.logic.prepare_history_sort(column),
+                    self.bus.call(sorted_by, column),
+                ),
+                name="time-tracker-history",
+                daemon=True,
+            ).start()
+
+        def sorted_by(column):
+            # Skipped if closed, or if another heading was clicked meanwhile
+            if window.winfo_exists() and state["sort"] == column:
+                load()
+
+        def show_headings():
+            for column in columns:
+                text = headings[column]
+                if column == state["sort"]:
+                    text += " ▼" if state["descending"] else " ▲"
+                tree.heading(column, text=text, command=lambda c=column: sort_by(c))
+
+        def refresh():
+            # A reload discards the indexes, so they are rebuilt off the Tk thread
+            index_in_background(keep_position=True)
+
+        def on_destroy(event):
+            if event.widget is window:
+                self._history_window = None
+                self._history_refresh = None
+
+        project_box.bind("<<ComboboxSelected>>", lambda e: load())
+        from_entry.bind("<Return>", lambda e: load())
+        to_entry.bind("<Return>", lambda e: load())
+        window.bind("<Destroy>", on_destroy)
+
+        btns = ttk.Frame(frm)
+        btns.grid(row=2, column=0, columnspan=2, sticky=tk.E, pady=(10, 0))
+        ttk.Button(btns, text="Close", command=window.destroy).pack(
+            side=tk.RIGHT, padx=(5, 0)
+        )
+        ttk.Button(btns, text="Apply", command=load).pack(side=tk.RIGHT)
+
+        def indexed(projects, keep_position):
+            if window.winfo_exists():
+                project_box["values"] = [all_projects] + projects
+                self._history_refresh = refresh
+                load(keep_position)
+
+        def index_in_background(keep_position=False):
+            # The first call builds the indexes, which can take a moment for
+            # a long history; later calls only index what was saved since
+            threading.Thread(
+                target=lambda: self.bus.call(
+                    indexed, self.logic.history_projects(), keep_position
+                ),
+                name="time-tracker-history",
+                daemon=True,
+            ).start()
+
+        show_headings()
+        count_var.set("Indexing…")
+        index_in_background()
+
+    def open_diagnostics_window(self, parent):
+        """Latency histograms and counters recorded by the instrumentation layer."""
+        from tkinter import filedialog, messagebox
+
+        window = tk.Toplevel(parent)
+        window.title("Diagnostics")
+        window.transient(parent)
+
+        frm = ttk.Frame(window, padding=10)
+        frm.grid(row=0, column=0, sticky=tk.NSEW)
+        window.grid_columnconfigure(0, weight=1)
+        window.grid_rowconfigure(0, weight=1)
+        frm.grid_columnconfigure(0, weight=1)
+        frm.grid_rowconfigure(1, weight=1)
+
+        enabled_var = tk.BooleanVar(value=metrics.enabled)
+
+        def toggle():
+            metrics.enabled = enabled_var.get()
+            self._save_user_settings()
+
+        ttk.Checkbutton(
+            frm, text="Record metrics", variable=enabled_var, command=toggle
+        ).grid(row=0, column=0, sticky=tk.W, pady=(0, 5))
+
+        columns = ("count", "p50", "p95", "p99", "max")
+        tree = ttk.Treeview(frm, columns=columns, height=14)
+        tree.heading("#0", text="Metric")
+        tree.column("#0", width=190)
+        for column in columns:
+            tree.heading(column, text=column if column == "count" else f"{column} ms")
+            tree.column(column, width=70, anchor=tk.E)
+        tree.grid(row=1, column=0, sticky=tk.NSEW)
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            report = metrics.snapshot()
+            for name, values in report["histograms"].items():
+                tree.insert(
+                    "",
+                    tk.END,
+                    text=name,
+                    values=(values["count"],)
+                    + tuple(
+                        f"{values[key]:.3f}"
+                        for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")
+                    ),
+                )
+            for name, value in report["counters"].items():
+                tree.insert("", tk.END, text=name, values=(value,))
+            window.after(1000, refresh)
+
+        def export():
+            file_path = filedialog.asksaveasfilename(
+                parent=window,
+                title="Export diagnostics",
+                defaultextension=".json",
+                filetypes=[["JSON files", "*.json"], ["All files", "*.*"]],
+                initialfile="time_tracker_metrics.json",
+            )
+            if not file_path:
+                return
+            try:
+                metrics.export(file_path)
+            except Exception as e:
+                messagebox.showerror(
+                    "Error", f"Could not export diagnostics: {e}", parent=window
+                )
+
+        btns = ttk.Frame(frm)
+        btns.grid(row=2, column=0, sticky=tk.E, pady=(10, 0))
+        ttk.Button(btns, text="Close", command=window.destroy).pack(
+            side=tk.RIGHT, padx=(5, 0)
+        )
+        ttk.Button(btns, text="Export JSON…", command=export).pack(
+            side=tk.RIGHT, padx=(5, 0)
+        )
+        ttk.Button(btns, text="Reset", command=metrics.reset).pack(side=tk.RIGHT)
+        refresh()
+
     def run(self):
         self.root.mainloop()
+        if self.control_server is not None:
+            self.control_server.close()
+        # Let the background writer finish any queued saves before exiting
+        self.logic.close()
 
 
 def main():
-    app = TimeTracker()
+    parser = argparse.ArgumentParser(description="Time Tracker")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print how long each startup phase took, then quit",
+    )
+    control = parser.add_mutually_exclusive_group()
+    control.add_argument(
+        "--control-port",
+        type=int,
+        help="Serve the local control API on 127.0.0.1:PORT",
+    )
+    control.add_argument(
+        "--control-socket",
+        metavar="PATH",
+        help="Serve the local control API on a Unix socket",
+    )
+    args = parser.parse_args()
+    app = TimeTracker(
+        profile_startup=args.profile_startup,
+        control_port=args.control_port,
+        control_socket=args.control_socket,
+    )
     app.run()
 
 
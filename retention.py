@@ -0,0 +1,101 @@
+import gzip
+import json
+import os
+import re
+import shutil
+
+from storage import _atomic_write, file_lock
+from time_entry import TimeEntry, to_json
+
+# Key marking a day summary; its value is how many entries it stands for
+SUMMARY_KEY = "summary"
+_DAY = re.compile(r"\d{4}-\d{2}-\d{2}$")
+
+
+def entry_count(entry):
+    """How many entries a record stands for: a summary's count, otherwise 1."""
+    if isinstance(entry, TimeEntry):
+        # Unknown keys live in extra; skip the mapping lookup for the rest
+        return (entry.extra.get(SUMMARY_KEY) or 1) if entry.extra else 1
+    return entry.get(SUMMARY_KEY) or 1
+
+
+def archive_path(data_file):
+    """The compressed archive next to a data file (or partition folder)."""
+    return data_file.rstrip("/\\") + ".archive.jsonl.gz"
+
+
+def summary_entry(day, project, duration, breaks, earnings, count):
+    """A day summary, in the save_time_entry schema plus SUMMARY_KEY."""
+    return {
+        "task": "",
+        "project": project,
+        "duration_seconds": duration,
+        "break_seconds": breaks,
+        "start_time": f"{day}T00:00:00",
+        "end_time": f"{day}T00:00:00",
+        "earnings": round(earnings, 4),
+        "date": day,
+        SUMMARY_KEY: count,
+    }
+
+
+def summarize_before(storage, cutoff, archive=None):
+    """Fold entries dated before cutoff into per-day, per-project summaries.
+
+    cutoff is a "YYYY-MM-DD" date. Summaries keep the duration, break and
+    earnings sums and the number of entries they replace, so reports over
+    them give the same totals. Older summaries are merged into the new
+    ones; entries without a valid date are kept as they are.
+
+    With archive (a path), the raw entries that were folded are appended
+    to that gzip-compressed JSON Lines file first, so a crash can at worst
+    leave them both archived and still in the store. Returns counts:
+    {"folded", "summaries", "kept"}.
+    """
+    groups = {}
+    kept = []
+    stats = {"folded": 0, "summaries": 0, "kept": 0}
+
+    def fold(out):
+        for entry in storage.iter_entries():
+            day = entry.get("date")
+            if not isinstance(day, str) or not _DAY.match(day) or day >= cutoff:
+                kept.append(entry)
+                continue
+            project = (entry.get("project") or "").strip()
+            totals = groups.get((day, project))
+            if totals is None:
+                totals = groups[(day, project)] = [0, 0, 0.0, 0]
+            totals[0] += int(entry.get("duration_seconds") or 0)
+            totals[1] += int(entry.get("break_seconds") or 0)
+            totals[2] += float(entry.get("earnings") or 0.0)
+            totals[3] += entry_count(entry)
+            if not entry.get(SUMMARY_KEY):
+                stats["folded"] += 1
+                if out is not None:
+                    out.write(json.dumps(entry, default=to_json).encode() + b"\n")
+
+    def write_archive(f):
+        if os.path.exists(archive):
+            with open(archive, "rb") as old:
+                shutil.copyfileobj(old, f)
+        # Appended as a new gzip member; gzip readers read all members
+        with gzip.GzipFile(fileobj=f, mode="wb") as out:
+            fold(out)
+
+    # Partition folders keep their lock file beside the folder, not in it
+    with file_lock(storage.path.rstrip("/\\")):
+        if archive is not None:
+            _atomic_write(archive, write_archive, mode="wb")
+        else:
+            fold(None)
+        if stats["folded"]:
+            summaries = [
+                summary_entry(day, project, *totals)
+                for (day, project), totals in sorted(groups.items())
+            ]
+            storage.write_all(summaries + kept)
+            stats["summaries"] = len(summaries)
+    stats["kept"] = len(kept)
+    return stats
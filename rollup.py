@@ -0,0 +1,106 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from columnar import EntryColumns
+from storage import JOURNAL_EXTENSIONS, SQLITE_EXTENSIONS, open_storage
+
+DATA_EXTENSIONS = (".json",) + JOURNAL_EXTENSIONS + SQLITE_EXTENSIONS
+
+
+def find_data_files(paths):
+    """Expand directories into the data files below them; keep files as given."""
+    found = []
+    for path in paths:
+        path = os.path.expandvars(os.path.expanduser(path))
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(DATA_EXTENSIONS):
+                    found.append(os.path.join(root, name))
+    return found
+
+
+def aggregate_file(path, by, date_from=None, date_to=None):
+    """Pre-aggregate one data file (runs in a worker process).
+
+    Entries are streamed into compact columns and reduced to per-group
+    totals, so only that small dict travels back to the parent.
+    Returns (totals, entry count, bytes read).
+    """
+    storage = open_storage(path)
+    try:
+        columns = EntryColumns.from_entries(storage.iter_entries())
+    finally:
+        storage.close()
+    return columns.totals(by, date_from, date_to), len(columns), os.path.getsize(path)
+
+
+def _merge(into, totals, prefix=None):
+    for key, values in totals.items():
+        if prefix is not None:
+            key = (prefix,) + (key if isinstance(key, tuple) else (key,))
+        merged = into.get(key)
+        if merged is None:
+            into[key] = dict(values)
+            continue
+        for name, value in values.items():
+            merged[name] += value
+
+
+def rollup(
+    paths,
+    by=("project", "week"),
+    date_from=None,
+    date_to=None,
+    jobs=None,
+    per_file=False,
+    on_error=None,
+):
+    """Grouped totals across many data files, aggregated in a process pool.
+
+    With per_file each key starts with the file's path relative to the
+    files' common directory, without extension (e.g.
+    "alice/time_tracker_data" for one file per person). Files that can't
+    be read are skipped and reported through on_error(path, exception).
+    Returns (totals, stats).
+    """
+    files = find_data_files(paths)
+    if files:
+        common = os.path.commonpath([os.path.abspath(path) for path in files])
+        if len(files) == 1 or not os.path.isdir(common):
+            common = os.path.dirname(common)
+    totals = {}
+    stats = {"files": len(files), "skipped": 0, "entries": 0, "bytes": 0}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(aggregate_file, path, by, date_from, date_to): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                partial, entries, size = future.result()
+            except Exception as e:
+                stats["skipped"] += 1
+                if on_error:
+                    on_error(path, e)
+                continue
+            if per_file:
+                name = os.path.relpath(os.path.abspath(path), common)
+                _merge(totals, partial, os.path.splitext(name)[0])
+            else:
+                _merge(totals, partial)
+            stats["entries"] += entries
+            stats["bytes"] += size
+    for values in totals.values():
+        values["earnings"] = round(values["earnings"], 4)
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = elapsed
+    stats["entries_per_sec"] = stats["entries"] / elapsed if elapsed else None
+    stats["mb_per_sec"] = stats["bytes"] / (1024 * 1024) / elapsed if elapsed else None
+    return dict(sorted(totals.items())), stats
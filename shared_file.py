@@ -0,0 +1,110 @@
+import os
+
+from storage import file_lock
+
+
+class SharedDataFile:
+    """An instance's view of a JSON or journal file that others also write.
+
+    Remembers how far the file has been read (a byte offset) and its
+    inode, size and mtime at that point. Writes follow a read-merge-append
+    protocol under the data file's advisory lock: entries other writers
+    appended since the last read are parsed from the remembered offset and
+    handed to on_entries, then this instance's entries are appended. The
+    cost is proportional to what changed, not to the size of the file.
+
+    A file that was rewritten instead of appended to (new inode, or
+    shorter than the remembered offset) can't be merged this way:
+    on_rewrite is called and the caller should reload it in full.
+    """
+
+    def __init__(self, storage, on_entries=None, on_rewrite=None):
+        self.storage = storage
+        self.on_entries = on_entries
+        self.on_rewrite = on_rewrite
+        self.offset = None  # None until the file has been read
+        self.inode = self.size = self.mtime_ns = None
+
+    @property
+    def path(self):
+        return self.storage.path
+
+    def _stat(self):
+        try:
+            return os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+    def _remember(self, offset, stat):
+        self.offset = offset
+        if stat is None:
+            self.inode = self.size = self.mtime_ns = None
+        else:
+            self.inode, self.size = stat.st_ino, stat.st_size
+            self.mtime_ns = stat.st_mtime_ns
+
+    def follow(self, offset, inode, size, mtime_ns):
+        """Start from a position read elsewhere (e.g. a snapshot header)."""
+        self.offset = offset
+        self.inode, self.size, self.mtime_ns = inode, size, mtime_ns
+
+    def load(self):
+        """Read the whole file and remember where it ends."""
+        with file_lock(self.path):
+            entries, offset = self.storage.tail(0)
+            self._remember(offset, self._stat())
+        return entries
+
+    def changed(self):
+        """Cheap check (one stat) for writes since the last read."""
+        stat = self._stat()
+        if stat is None:
+            return self.inode is not None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns) != (
+            self.inode,
+            self.size,
+            self.mtime_ns,
+        )
+
+    def rewritten(self):
+        """Whether the file was replaced or truncated since the last read."""
+        stat = self._stat()
+        if stat is None:
+            return self.inode is not None
+        if self.inode is None:
+            return False  # Created since: everything in it is new
+        return stat.st_ino != self.inode or stat.st_size < self.offset
+
+    def read_new(self):
+        """Entries appended by others since the last read.
+
+        Returns None (after calling on_rewrite) if the file was rewritten;
+        nothing is merged after that until the file is read again.
+        """
+        if self.offset is None:
+            return []
+        with file_lock(self.path):
+            if self.rewritten():
+                self.offset = None
+                if self.on_rewrite:
+                    self.on_rewrite()
+                return None
+            entries, offset = self.storage.tail(self.offset)
+            self._remember(offset, self._stat())
+            if entries and self.on_entries:
+                self.on_entries(entries)
+        return entries
+
+    def append_many(self, entries):
+        """Merge what others appended, then append entries.
+
+        Used as the BackgroundWriter target in place of the storage.
+        """
+        if not entries:
+            return
+        with file_lock(self.path):
+            self.read_new()
+            self.storage.append_many(entries)
+            if self.offset is not None:
+                # Step over our own entries so they aren't merged back in
+                self._remember(self.storage.tail(self.offset)[1], self._stat())
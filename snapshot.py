@@ -0,0 +1,315 @@
+import json
+import mmap
+import os
+import struct
+
+from storage import _fsync_dir
+from time_entry import ENTRY_FIELDS, TimeEntry
+
+# Backends whose data file can be cached in a snapshot
+SNAPSHOT_KINDS = ("json", "journal")
+SNAPSHOT_SUFFIX = ".snap"
+
+MAGIC = b"TTSNAP01"
+# magic, entries, strings, projects, strings_at, projects_at,
+# source inode, source mtime_ns, source size, source offset, source check bytes
+HEADER = struct.Struct("<8sQQQQQQqQQ32s")
+# flags, task, project, date (string ids), duration, break, earnings,
+# start, end (ISO timestamps, NUL-padded)
+RECORD = struct.Struct("<IIIIqqd26s26s")
+# RECORD with duration, break and earnings left packed, for TimeEntry
+PACKED_RECORD = struct.Struct("<IIII24s26s26s")
+OFFSET = struct.Struct("<Q")
+PROJECT = struct.Struct("<I")
+# Record holds an entry that doesn't fit the fixed layout; task is its JSON
+RAW = 1
+
+_INT64 = range(-(1 << 63), 1 << 63)
+
+
+def snapshot_path(path):
+    return path + SNAPSHOT_SUFFIX
+
+
+def _timestamp_fits(value):
+    # "YYYY-MM-DDTHH:MM:SS.ffffff" is 26 characters
+    return (
+        type(value) is str
+        and len(value) <= 26
+        and value.isascii()
+        and not value.endswith("\0")
+    )
+
+
+def _packable(entry):
+    if len(entry) != len(ENTRY_FIELDS):
+        return False
+    try:
+        return (
+            type(entry["task"]) is str
+            and type(entry["project"]) is str
+            and type(entry["date"]) is str
+            and type(entry["duration_seconds"]) is int
+            and type(entry["break_seconds"]) is int
+            and type(entry["earnings"]) is float
+            and entry["duration_seconds"] in _INT64
+            and entry["break_seconds"] in _INT64
+            and _timestamp_fits(entry["start_time"])
+            and _timestamp_fits(entry["end_time"])
+        )
+    except KeyError:
+        return False
+
+
+def _check_bytes(path, offset):
+    """The bytes just before offset, compared to detect in-place rewrites."""
+    with open(path, "rb") as f:
+        f.seek(max(0, offset - 32))
+        return f.read(min(offset, 32)).ljust(32, b"\0")
+
+
+class Snapshot:
+    """Read-only, memory-mapped snapshot of a data file.
+
+    Entries are fixed-width records; project, task and date strings live
+    once in a string table and are referenced by id. Opening only maps
+    the file and reads the header, so it costs the same for any history
+    size; records are decoded when entries() is called, straight from the
+    mapping.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (
+                magic,
+                self.count,
+                self._string_count,
+                self._project_count,
+                self._strings_at,
+                self._projects_at,
+                self.source_inode,
+                self.source_mtime_ns,
+                self.source_size,
+                self.source_offset,
+                self.source_check,
+            ) = HEADER.unpack_from(self._map)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a time tracker snapshot")
+            self._blob_at = self._strings_at + OFFSET.size * (
+                self._string_count + 1
+            )
+            expected = self._projects_at + PROJECT.size * self._project_count
+            if (
+                HEADER.size + RECORD.size * self.count != self._strings_at
+                or expected != len(self._map)
+            ):
+                raise ValueError(f"{path} is truncated or corrupt")
+        except BaseException:
+            self._map.close()
+            raise
+        self._strings = {}
+
+    def __len__(self):
+        return self.count
+
+    def string(self, sid):
+        value = self._strings.get(sid)
+        if value is None:
+            start, end = struct.unpack_from(
+                "<QQ", self._map, self._strings_at + OFFSET.size * sid
+            )
+            value = self._strings[sid] = str(
+                self._map[self._blob_at + start : self._blob_at + end], "utf-8"
+            )
+        return value
+
+    def strings(self):
+        return [self.string(sid) for sid in range(self._string_count)]
+
+    def projects(self):
+        """Distinct project names, without decoding any entries."""
+        end = self._projects_at + PROJECT.size * self._project_count
+        return [
+            self.string(sid)
+            for (sid,) in PROJECT.iter_unpack(self._map[self._projects_at : end])
+        ]
+
+    def entries(self):
+        """Decode every record into a TimeEntry, in file order."""
+        strings = self.strings()
+        entries = []
+        append = entries.append
+        with (
+            memoryview(self._map) as view,
+            view[HEADER.size : self._strings_at] as records,
+        ):
+            for flags, task, project, day, numbers, start, end in (
+                PACKED_RECORD.iter_unpack(records)
+            ):
+                if flags & RAW:
+                    append(TimeEntry.from_dict(json.loads(strings[task])))
+                    continue
+                start = start.rstrip(b"\0")
+                end = end.rstrip(b"\0")
+                if len(start) == len(end):
+                    append(
+                        TimeEntry.from_packed(
+                            strings[task],
+                            strings[project],
+                            strings[day],
+                            numbers + start + end,
+                        )
+                    )
+                    continue
+                duration, pause, earnings = struct.unpack("<qqd", numbers)
+                append(
+                    TimeEntry(
+                        strings[task],
+                        strings[project],
+                        duration,
+                        pause,
+                        start.decode("ascii"),
+                        end.decode("ascii"),
+                        earnings,
+                        strings[day],
+                    )
+                )
+        return entries
+
+    def copy_records(self, f):
+        """Write the raw record bytes to f, for a rebuilt snapshot."""
+        with (
+            memoryview(self._map) as view,
+            view[HEADER.size : self._strings_at] as records,
+        ):
+            f.write(records)
+
+    def close(self):
+        self._map.close()
+
+
+def _write_snapshot(path, source, stat, old, entries, offset):
+    """Write old's records plus entries to path, atomically.
+
+    stat describes the data file as it was before entries were read from it.
+    """
+    strings = old.strings() if old is not None else []
+    ids = {value: sid for sid, value in enumerate(strings)}
+    projects = dict.fromkeys(old.projects() if old is not None else ())
+
+    def sid(value):
+        found = ids.get(value)
+        if found is None:
+            found = ids[value] = len(strings)
+            strings.append(value)
+        return found
+
+    records = bytearray()
+    for entry in entries:
+        project = entry.get("project")
+        if type(project) is str:
+            projects.setdefault(project)
+        if not _packable(entry):
+            raw = sid(json.dumps(entry))
+            records += RECORD.pack(RAW, raw, 0, 0, 0, 0, 0.0, b"", b"")
+            continue
+        records += RECORD.pack(
+            0,
+            sid(entry["task"]),
+            sid(project),
+            sid(entry["date"]),
+            entry["duration_seconds"],
+            entry["break_seconds"],
+            entry["earnings"],
+            entry["start_time"].encode("ascii"),
+            entry["end_time"].encode("ascii"),
+        )
+
+    project_ids = [sid(project) for project in projects]
+    encoded = [value.encode("utf-8") for value in strings]
+    count = (old.count if old is not None else 0) + len(entries)
+    strings_at = HEADER.size + RECORD.size * count
+    blob_at = strings_at + OFFSET.size * (len(encoded) + 1)
+    projects_at = blob_at + sum(map(len, encoded))
+    header = HEADER.pack(
+        MAGIC,
+        count,
+        len(encoded),
+        len(project_ids),
+        strings_at,
+        projects_at,
+        stat.st_ino,
+        stat.st_mtime_ns,
+        stat.st_size,
+        offset,
+        _check_bytes(source, offset),
+    )
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            if old is not None:
+                old.copy_records(f)
+            f.write(records)
+            position = 0
+            for value in encoded:
+                f.write(OFFSET.pack(position))
+                position += len(value)
+            f.write(OFFSET.pack(position))
+            f.writelines(encoded)
+            f.writelines(PROJECT.pack(project) for project in project_ids)
+            f.flush()
+            os.fsync(f.fileno())
+        if old is not None:
+            old.close()  # Windows can't replace a mapped file
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(path)
+
+
+def load_snapshot(storage):
+    """Open an up-to-date snapshot of a JSON or journal storage's data file.
+
+    A missing or unreadable snapshot is rebuilt from the data file. One
+    that is older than the data file is extended with just the entries
+    appended since, as long as the file was only appended to (same inode,
+    same bytes before the old end); otherwise it is rebuilt. Returns None
+    when the data file doesn't exist.
+    """
+    source = storage.path
+    try:
+        stat = os.stat(source)
+    except FileNotFoundError:
+        return None
+    path = snapshot_path(source)
+    try:
+        old = Snapshot(path)
+    except (OSError, ValueError, struct.error):
+        old = None
+    if old is not None:
+        if (
+            old.source_inode == stat.st_ino
+            and old.source_mtime_ns == stat.st_mtime_ns
+            and old.source_size == stat.st_size
+        ):
+            return old
+        if (
+            old.source_inode != stat.st_ino
+            or stat.st_size < old.source_offset
+            or _check_bytes(source, old.source_offset) != old.source_check
+        ):
+            old.close()
+            old = None
+    entries, offset = storage.tail(old.source_offset if old is not None else 0)
+    try:
+        _write_snapshot(path, source, stat, old, entries, offset)
+    finally:
+        if old is not None:
+            old.close()
+    return Snapshot(path)
@@ -0,0 +1,742 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from instrumentation import metrics
+from time_entry import ENTRY_FIELDS, to_json
+
+JOURNAL_EXTENSIONS = (".jsonl", ".ndjson")
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+MONTH_PATTERN = re.compile(r"\d{4}-\d{2}")
+# Shard for entries whose date is missing or malformed
+UNDATED = "undated"
+
+
+def _ensure_parent_dir(path):
+    target_dir = os.path.dirname(os.path.abspath(path)) or "."
+    os.makedirs(target_dir, exist_ok=True)
+
+
+def _fsync_dir(path):
+    """Make a rename inside path durable (a no-op where directories can't be opened)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _FileLock:
+    """Advisory lock on "<data file>.lock", shared by every thread of a process.
+
+    The lock lives in a sidecar file because atomic rewrites replace the
+    data file itself. Re-entrant, so storage methods can lock while a
+    caller already holds the lock around a read-merge-append.
+    """
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._acquire()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._thread_lock.release()
+
+    def _acquire(self):
+        _ensure_parent_dir(self.path)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        # Gives up after about ten seconds; keep waiting
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+
+_LOCKS = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def file_lock(path):
+    """The process-wide advisory lock for a data file (use as a context manager)."""
+    key = os.path.normcase(os.path.abspath(path))
+    with _LOCKS_GUARD:
+        lock = _LOCKS.get(key)
+        if lock is None:
+            lock = _LOCKS[key] = _FileLock(path)
+        return lock
+
+
+def _atomic_write(path, write, mode="w"):
+    """Write a file via temp file + fsync + rename so readers never see half of it."""
+    _ensure_parent_dir(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(path)
+
+
+def _entry_block(entry):
+    """Render one entry exactly as json.dump(list, indent=2) lays out an element."""
+    return json.dumps([entry], indent=2, default=to_json)[2:-2].encode("ascii")
+
+
+def dump_json_array(entries, f):
+    """Stream entries to a text file in json.dump(list, indent=2) layout.
+
+    Unlike json.dump this accepts any iterable, so a generator can be
+    written without materializing it. Returns the number of entries.
+    """
+    count = 0
+    for entry in entries:
+        f.write("[\n" if count == 0 else ",\n")
+        f.write(_entry_block(entry).decode("ascii"))
+        count += 1
+    f.write("\n]" if count else "[]")
+    return count
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array read from a text file.
+
+    Reads fixed-size chunks, so memory stays bounded by the largest
+    element rather than the file size.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    state = "start"  # start -> first -> (after -> value)* -> done
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buf) or (state in ("first", "value") and not eof):
+            # Values may straddle a chunk boundary: keep at least one chunk ahead
+            if not eof and len(buf) - pos < chunk_size:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            if pos == len(buf):
+                raise ValueError("Unexpected end of JSON array")
+        ch = buf[pos]
+        if state == "start":
+            if ch != "[":
+                raise ValueError("Data file does not contain a JSON array")
+            pos += 1
+            state = "first"
+        elif state in ("first", "value"):
+            if ch == "]" and state == "first":
+                return
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Element longer than the look-ahead: read another chunk
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield value
+            pos = end
+            state = "after"
+        else:
+            pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {ch!r}")
+            state = "value"
+
+
+class Storage:
+    """Base class for data file backends.
+
+    File backends have no indexes; TimeTrackerLogic answers queries from the
+    loaded entries for them. Indexed backends answer unique_projects() and
+    query() themselves.
+    """
+
+    kind = None
+    indexed = False
+    partitioned = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        return list(self.iter_entries())
+
+    def iter_entries(self):
+        """Yield stored entries one at a time, in insertion order."""
+        raise NotImplementedError
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        raise NotImplementedError
+
+    def write_all(self, entries):
+        raise NotImplementedError
+
+    def unique_projects(self):
+        raise NotImplementedError
+
+    def query(self, project=None, date_from=None, date_to=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonFileStorage(Storage):
+    """The original format: one JSON array holding the whole history."""
+
+    kind = "json"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with file_lock(self.path), open(self.path, "r") as f:
+            return json.load(f)
+
+    def tail(self, offset=0):
+        """Parse the elements stored after byte offset.
+
+        Returns (entries, new_offset), where new_offset is the end of the
+        last element: the point append_many writes from. Offset 0 parses
+        the whole file.
+        """
+        if not os.path.exists(self.path):
+            return [], 0
+        with file_lock(self.path), open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        text = data.rstrip()
+        if not text.endswith(b"]"):
+            raise ValueError(f"{self.path} does not end with a JSON array")
+        body = text[:-1].rstrip()
+        if offset == 0:
+            entries = json.loads(text)
+        else:
+            # What append_many wrote: ",\n  {...},\n  {...}\n]"
+            head = body.lstrip()
+            if head.startswith(b","):
+                head = head[1:]
+            entries = json.loads(b"[" + head + b"]")
+        return entries, offset + len(body)
+
+    def iter_entries(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            yield from iter_json_array(f)
+
+    def append_many(self, entries):
+        """Append entries by patching the closing bracket in place.
+
+        Only the new elements are written, so the cost no longer grows with
+        the size of the history. The file stays a valid, indent=2 JSON array.
+        """
+        if not entries:
+            return
+        with file_lock(self.path):
+            self._append_locked(entries)
+
+    def _append_locked(self, entries):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            self.write_all(list(entries))
+            return
+        with metrics.timed("save.serialize"):
+            block = b",\n".join(_entry_block(entry) for entry in entries)
+        with open(self.path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            tail_start = max(0, end - 4096)
+            f.seek(tail_start)
+            tail = f.read().rstrip()
+            before = tail[:-1].rstrip()
+            if not tail.endswith(b"]") or not before:
+                raise ValueError(f"{self.path} does not end with a JSON array")
+            if before.endswith(b"["):
+                # Empty array: keep the opening bracket, replace the closing one
+                f.seek(tail_start + len(before))
+                f.write(b"\n" + block + b"\n]")
+            else:
+                f.seek(tail_start + len(before))
+                f.write(b",\n" + block + b"\n]")
+            f.truncate()
+            f.flush()
+            with metrics.timed("save.fsync"):
+                os.fsync(f.fileno())
+
+    def write_all(self, entries):
+        with file_lock(self.path):
+            _atomic_write(self.path, lambda f: dump_json_array(entries, f))
+
+
+class JournalStorage(Storage):
+    """Append-only JSON Lines journal: one entry per line.
+
+    A save writes a single line. A torn final line (e.g. after a crash while
+    writing) is ignored on load and dropped by compact().
+    """
+
+    kind = "journal"
+
+    def iter_entries(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                text = line.strip()
+                if not text:
+                    continue
+                try:
+                    yield json.loads(text)
+                except json.JSONDecodeError:
+                    # Only the last line can lack its newline: a torn write
+                    if not line.endswith("\n"):
+                        return
+                    raise
+
+    def tail(self, offset=0):
+        """Parse the complete lines stored after byte offset.
+
+        Returns (entries, new_offset); a torn last line is left for later.
+        """
+        if not os.path.exists(self.path):
+            return [], 0
+        with file_lock(self.path), open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        lines = data[:end].splitlines()
+        return [json.loads(line) for line in lines if line.strip()], offset + end
+
+    def append_many(self, entries):
+        if not entries:
+            return
+        _ensure_parent_dir(self.path)
+        with metrics.timed("save.serialize"):
+            line = b"".join(
+                json.dumps(entry, default=to_json).encode("ascii") + b"\n"
+                for entry in entries
+            )
+        with (
+            file_lock(self.path),
+            open(self.path, "r+b" if os.path.exists(self.path) else "wb") as f,
+        ):
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    # A previous write was torn: drop the partial line first
+                    end = self._last_line_end(f, end)
+                    f.seek(end)
+                    f.truncate()
+            f.write(line)
+            f.flush()
+            with metrics.timed("save.fsync"):
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def _last_line_end(f, end):
+        pos = end
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                return start + newline + 1
+            pos = start
+        return 0
+
+    def write_all(self, entries):
+        def write(f):
+            for entry in entries:
+                f.write(json.dumps(entry, default=to_json) + "\n")
+
+        with file_lock(self.path):
+            _atomic_write(self.path, write)
+
+    def compact(self):
+        """Rewrite the journal without blank or torn lines."""
+        with file_lock(self.path):
+            self.write_all(self.load())
+
+
+class SqliteStorage(Storage):
+    """SQLite database with indexes on project, date and start_time.
+
+    Keys missing from older entries are stored as NULL and left out again on
+    load, so JSON round-trips are lossless for the save_time_entry schema.
+    The extra summary column marks day summaries (see retention.py).
+    """
+
+    kind = "sqlite"
+    indexed = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            task TEXT,
+            project TEXT,
+            duration_seconds INTEGER,
+            break_seconds INTEGER,
+            start_time TEXT,
+            end_time TEXT,
+            earnings REAL,
+            date TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_project ON entries(project);
+        CREATE INDEX IF NOT EXISTS idx_entries_date ON entries(date);
+        CREATE INDEX IF NOT EXISTS idx_entries_start_time ON entries(start_time);
+    """
+    COLUMNS = ENTRY_FIELDS + ("summary",)
+    INSERT_SQL = (
+        f"INSERT INTO entries ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in COLUMNS)})"
+    )
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._conn = None
+        # The connection is shared with background threads, one statement at a time
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            _ensure_parent_dir(self.path)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(self.SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+            if "summary" not in columns:  # Databases from before summaries
+                with conn:
+                    conn.execute("ALTER TABLE entries ADD COLUMN summary INTEGER")
+            self._conn = conn
+        return self._conn
+
+    @classmethod
+    def _row(cls, entry):
+        return tuple(entry.get(field) for field in cls.COLUMNS)
+
+    @classmethod
+    def _entry(cls, row):
+        return {
+            field: value for field, value in zip(cls.COLUMNS, row) if value is not None
+        }
+
+    def _select(self, where="", params=()):
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM entries {where}"
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        return self._select("ORDER BY id")
+
+    def iter_entries(self, batch_size=1000):
+        if not os.path.exists(self.path):
+            return
+        with self._lock:
+            self._connection()  # Adds the summary column to older databases
+        # A separate connection so a long export doesn't hold the shared lock
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM entries ORDER BY id"
+            )
+            while rows := cursor.fetchmany(batch_size):
+                for row in rows:
+                    yield self._entry(row)
+        finally:
+            conn.close()
+
+    def append_many(self, entries):
+        if not entries:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(self.INSERT_SQL, map(self._row, entries))
+
+    def write_all(self, entries):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM entries")
+                conn.executemany(self.INSERT_SQL, map(self._row, entries))
+
+    def unique_projects(self):
+        """Distinct non-empty project names, read from the project index."""
+        if not os.path.exists(self.path):
+            return []
+        sql = (
+            "SELECT DISTINCT project FROM entries "
+            "WHERE project <> '' ORDER BY project"
+        )
+        with self._lock:
+            rows = self._connection().execute(sql).fetchall()
+        return sorted({row[0].strip() for row in rows if row[0].strip()})
+
+    def query(self, project=None, date_from=None, date_to=None):
+        """Entries filtered by project and an inclusive date range, by start time."""
+        clauses = []
+        params = []
+        if project is not None:
+            clauses.append("project = ?")
+            params.append(project)
+        if date_from is not None:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            clauses.append("date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._select(where + "ORDER BY start_time, id", params)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def month_of(entry):
+    """Partition key for an entry: "YYYY-MM" from its date, or UNDATED."""
+    month = (entry.get("date") or "")[:7]
+    return month if MONTH_PATTERN.fullmatch(month) else UNDATED
+
+
+class PartitionedStorage(Storage):
+    """A directory with one JSON Lines shard per month ("2025-03.jsonl").
+
+    Entries go to the shard for their date, so reads can be limited to the
+    months a query covers and older history is only parsed when needed.
+    """
+
+    kind = "partitioned"
+    partitioned = True
+
+    def __init__(self, path):
+        super().__init__(path.rstrip("/\\") or path)
+
+    def _shard(self, month):
+        return JournalStorage(os.path.join(self.path, f"{month}.jsonl"))
+
+    def months(self):
+        """Months that have a shard, oldest first; UNDATED sorts last."""
+        if not os.path.isdir(self.path):
+            return []
+        months = []
+        for name in os.listdir(self.path):
+            stem, ext = os.path.splitext(name)
+            if ext == ".jsonl" and (MONTH_PATTERN.fullmatch(stem) or stem == UNDATED):
+                months.append(stem)
+        return sorted(months)
+
+    def months_between(self, date_from=None, date_to=None):
+        """Shards that can hold entries in the inclusive "YYYY-MM-DD" range."""
+        lo = date_from[:7] if date_from else None
+        hi = date_to[:7] if date_to else None
+        months = []
+        for month in self.months():
+            if month == UNDATED:
+                # Undated entries never match a date filter
+                if lo is None and hi is None:
+                    months.append(month)
+            elif (lo is None or month >= lo) and (hi is None or month <= hi):
+                months.append(month)
+        return months
+
+    def iter_entries(self, months=None):
+        for month in self.months() if months is None else months:
+            yield from self._shard(month).iter_entries()
+
+    def load_months(self, months):
+        return list(self.iter_entries(months))
+
+    def append_many(self, entries):
+        groups = {}
+        for entry in entries:
+            groups.setdefault(month_of(entry), []).append(entry)
+        for month, group in groups.items():
+            self._shard(month).append_many(group)
+
+    def write_all(self, entries):
+        """Re-shard entries into a fresh directory, then swap it into place."""
+        tmp_dir = f"{self.path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        handles = {}
+        try:
+            for entry in entries:
+                month = month_of(entry)
+                f = handles.get(month)
+                if f is None:
+                    f = handles[month] = open(
+                        os.path.join(tmp_dir, f"{month}.jsonl"), "w"
+                    )
+                f.write(json.dumps(entry, default=to_json) + "\n")
+            for f in handles.values():
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            for f in handles.values():
+                f.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        for f in handles.values():
+            f.close()
+        old_dir = f"{self.path}.{os.getpid()}.old"
+        if os.path.exists(self.path):
+            os.replace(self.path, old_dir)
+        os.replace(tmp_dir, self.path)
+        _fsync_dir(self.path)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def compact(self):
+        """Merge and rewrite all shards.
+
+        Entries in the wrong shard are moved, blank and torn lines are dropped,
+        and each shard is sorted by start time.
+        """
+        self.write_all(self.iter_entries())
+        for month in self.months():
+            shard = self._shard(month)
+            entries = shard.load()
+            entries.sort(key=lambda e: (e.get("date") or "", e.get("start_time") or ""))
+            shard.write_all(entries)
+
+
+BACKENDS = {
+    "json": JsonFileStorage,
+    "journal": JournalStorage,
+    "sqlite": SqliteStorage,
+    "partitioned": PartitionedStorage,
+}
+
+# Extension used when switching an existing path to another backend; a
+# trailing separator marks a partitioned directory
+DEFAULT_EXTENSIONS = {
+    "json": ".json",
+    "journal": ".jsonl",
+    "sqlite": ".db",
+    "partitioned": os.sep,
+}
+
+
+def backend_for_path(path):
+    """Infer the backend kind from a data file path's extension.
+
+    Existing directories and paths ending in a separator are partitioned.
+    """
+    if os.path.isdir(path) or path.endswith(("/", os.sep)):
+        return "partitioned"
+    lowered = path.lower()
+    if lowered.endswith(JOURNAL_EXTENSIONS):
+        return "journal"
+    if lowered.endswith(SQLITE_EXTENSIONS):
+        return "sqlite"
+    return "json"
+
+
+def path_for_backend(path, kind):
+    """Return path with its extension swapped for the given backend's, if needed."""
+    if backend_for_path(path) == kind:
+        return path
+    return os.path.splitext(path.rstrip("/\\"))[0] + DEFAULT_EXTENSIONS[kind]
+
+
+def open_storage(path, kind=None):
+    """Open a storage backend for a data file path.
+
+    The backend is inferred from the extension unless kind is given.
+    """
+    return BACKENDS[kind or backend_for_path(path)](path)
+
+
+def convert_data_file(src_path, dst_path):
+    """Copy all entries from one data file to another, converting the format.
+
+    Returns the number of entries written. The source file is left untouched.
+    """
+    src = open_storage(src_path)
+    dst = open_storage(dst_path)
+    count = 0
+
+    def counted(entries):
+        nonlocal count
+        for entry in entries:
+            count += 1
+            yield entry
+
+    try:
+        # Streamed, so converting never holds the whole history in memory
+        dst.write_all(counted(src.iter_entries()))
+    finally:
+        src.close()
+        dst.close()
+    return count
@@ -0,0 +1,255 @@
+import struct
+import sys
+from datetime import date, datetime
+
+
+# Keys written by TimeTrackerLogic.save_time_entry, in file order
+ENTRY_FIELDS = (
+    "task",
+    "project",
+    "duration_seconds",
+    "break_seconds",
+    "start_time",
+    "end_time",
+    "earnings",
+    "date",
+)
+_FIELD_SET = frozenset(ENTRY_FIELDS)
+# Low-cardinality strings shared by many entries
+_INTERNED = frozenset(("task", "project", "date"))
+# Fields kept together in TimeEntry._rest. Packed, that is the numbers
+# as below, then start_time and end_time as ASCII text of equal length.
+_PACKED = ("duration_seconds", "break_seconds", "earnings", "start_time", "end_time")
+_NUMBERS = struct.Struct("<qqd")
+_UNSET = object()  # A field missing from an older entry
+
+
+def _pack(duration_seconds, break_seconds, earnings, start_time, end_time):
+    """The _rest of an entry: bytes for the usual types, else a plain tuple."""
+    if (
+        type(duration_seconds) is int
+        and type(break_seconds) is int
+        and type(earnings) is float
+        and type(start_time) is str
+        and type(end_time) is str
+        and len(start_time) == len(end_time)
+    ):
+        try:
+            return _NUMBERS.pack(duration_seconds, break_seconds, earnings) + (
+                start_time + end_time
+            ).encode("ascii")
+        except (struct.error, UnicodeEncodeError):
+            pass  # Beyond 64 bits, or not ASCII
+    return (duration_seconds, break_seconds, earnings, start_time, end_time)
+
+
+def _packed_field(index):
+    name = _PACKED[index]
+
+    def get(self):
+        rest = self._rest
+        if type(rest) is not bytes:
+            value = rest[index]
+            if value is _UNSET:
+                raise AttributeError(name)
+            return value
+        if index < 3:
+            return _NUMBERS.unpack_from(rest)[index]
+        size = (len(rest) - _NUMBERS.size) // 2
+        at = _NUMBERS.size + (index - 3) * size
+        return rest[at : at + size].decode("ascii")
+
+    return property(get)
+
+
+class TimeEntry:
+    """One saved time entry, stored compactly.
+
+    Uses __slots__ instead of a per-entry dict, and interns task, project
+    and date strings so entries share them. The durations, earnings and
+    timestamps are packed into one bytes object (the same layout idea as a
+    snapshot record) and unpacked when read; timestamps come back as the
+    exact ISO strings from the data file. Values of other types are kept
+    as they are. Keys missing from older entries stay unset, and unknown
+    keys are kept in extra, so to_dict() gives back exactly what was loaded.
+
+    Entries also behave like read-only mappings (entry["project"],
+    entry.get("earnings"), "date" in entry), matching the dicts they replace.
+    """
+
+    __slots__ = ("task", "project", "date", "_rest", "extra")
+
+    duration_seconds = _packed_field(0)
+    break_seconds = _packed_field(1)
+    earnings = _packed_field(2)
+    start_time = _packed_field(3)
+    end_time = _packed_field(4)
+
+    def __init__(
+        self,
+        task,
+        project,
+        duration_seconds,
+        break_seconds,
+        start_time,
+        end_time,
+        earnings,
+        date,
+    ):
+        self.task = sys.intern(task)
+        self.project = sys.intern(project)
+        self.date = sys.intern(date)
+        self._rest = _pack(
+            duration_seconds, break_seconds, earnings, start_time, end_time
+        )
+        self.extra = None
+
+    @classmethod
+    def from_packed(cls, task, project, date, packed):
+        """An entry from fields already in the packed layout.
+
+        packed is duration_seconds, break_seconds and earnings as "<qqd",
+        then start_time and end_time as ASCII bytes of equal length. A
+        snapshot record holds them the same way, so it is used as it is.
+        """
+        entry = cls.__new__(cls)
+        entry.task = sys.intern(task)
+        entry.project = sys.intern(project)
+        entry.date = sys.intern(date)
+        entry._rest = packed
+        entry.extra = None
+        return entry
+
+    @classmethod
+    def from_dict(cls, data):
+        entry = cls.__new__(cls)
+        entry.extra = None
+        if len(data) == len(ENTRY_FIELDS):
+            # Fast path for the current schema
+            try:
+                entry.task = sys.intern(data["task"])
+                entry.project = sys.intern(data["project"])
+                entry.date = sys.intern(data["date"])
+                entry._rest = _pack(
+                    data["duration_seconds"],
+                    data["break_seconds"],
+                    data["earnings"],
+                    data["start_time"],
+                    data["end_time"],
+                )
+                return entry
+            except (KeyError, TypeError):
+                entry = cls.__new__(cls)
+                entry.extra = None
+        rest = [_UNSET] * len(_PACKED)
+        for key, value in data.items():
+            if key in _FIELD_SET:
+                if key not in _INTERNED:
+                    rest[_PACKED.index(key)] = value
+                    continue
+                if type(value) is str:
+                    value = sys.intern(value)
+                setattr(entry, key, value)
+            else:
+                if entry.extra is None:
+                    entry.extra = {}
+                entry.extra[key] = value
+        # A missing field is never packable, so such entries keep a tuple
+        entry._rest = _pack(*rest)
+        return entry
+
+    def to_dict(self):
+        data = {}
+        for key in ENTRY_FIELDS:
+            try:
+                data[key] = getattr(self, key)
+            except AttributeError:
+                pass
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @property
+    def start(self):
+        """start_time parsed into a datetime (None if missing)."""
+        value = getattr(self, "start_time", None)
+        return datetime.fromisoformat(value) if value else None
+
+    @property
+    def end(self):
+        """end_time parsed into a datetime (None if missing)."""
+        value = getattr(self, "end_time", None)
+        return datetime.fromisoformat(value) if value else None
+
+    @property
+    def day(self):
+        """The entry's date as a datetime.date (None if missing)."""
+        value = getattr(self, "date", None)
+        return date.fromisoformat(value) if value else None
+
+    # Read-only mapping protocol, for code written against the dict entries
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __eq__(self, other):
+        if isinstance(other, TimeEntry):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"TimeEntry({self.to_dict()!r})"
+
+
+def to_json(entry):
+    """json.dump(default=...) hook that serializes TimeEntry objects."""
+    if isinstance(entry, TimeEntry):
+        return entry.to_dict()
+    raise TypeError(f"Object of type {type(entry).__name__} is not JSON serializable")
+
+
+def entries_from_dicts(entries):
+    """Convert a list of entry dicts to TimeEntry objects in place and return it.
+
+    Converting in place lets each dict be freed as soon as it is replaced,
+    so peak memory stays close to the size of the raw list.
+    """
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, TimeEntry):
+            entries[i] = TimeEntry.from_dict(entry)
+    return entries
@@ -1,40 +1,175 @@
-import json
 import os
 from datetime import datetime, timedelta
+from itertools import islice
 import threading
 import time
 
+from aggregates import AggregateCache
+from checkpoint import (
+    PAUSED,
+    RUNNING,
+    CheckpointWriter,
+    SessionCheckpoint,
+    checkpoint_path,
+)
+from completion import NameIndex
+from history_index import HistoryIndex
+from integrity import scan_records
+from shared_file import SharedDataFile
+from instrumentation import metrics
+from retention import archive_path, summarize_before
+from snapshot import SNAPSHOT_KINDS, load_snapshot
+from storage import UNDATED, convert_data_file, month_of, open_storage
+from time_entry import TimeEntry, entries_from_dicts
+from writer import BackgroundWriter
+
 
 class TimeTrackerLogic:
-    def __init__(self):
+    # poll_changes() backs off between these while the data file is idle
+    WATCH_MIN_INTERVAL = 1.0
+    WATCH_MAX_INTERVAL = 30.0
+
+    def __init__(self, data_file=None, autoload=True):
         # Core state
         self.is_running = False
         self.is_paused = False
-        self.start_time = None
+        self.start_time = None  # Wall-clock start of the current active segment
         self.elapsed_time = timedelta()
         self.total_paused_time = timedelta()  # Track total time spent paused
         self.session_start_timestamp = None  # Actual session start timestamp
         self.timer_thread = None
 
+        # Durations are measured on the monotonic clock so wall-clock jumps
+        # (NTP, DST, manual changes) can't corrupt them
+        self._clock = threading.Condition(threading.RLock())
+        self._session_start_mono = None
+        self._segment_start_mono = None
+        self._pause_start_mono = None
+        self._shown_second = None
+        self._closed = False
+        # Names the session was started with, for the checkpoint
+        self._session_names = ("", "")
+
         # Persistence / data
-        self.data_file = os.path.join(os.path.expanduser("~"), "time_tracker_data.json")
+        self.data_file = data_file or os.path.join(
+            os.path.expanduser("~"), "time_tracker_data.json"
+        )
+        self.storage = open_storage(self.data_file)
+        self.shared = self._open_shared()
+        # Set when another program rewrote the data file; load_data clears it
+        self.reload_needed = False
+        self.watch_interval = self.WATCH_MIN_INTERVAL
+        # If the data file has damaged records, load_data skips them and
+        # loads the rest instead of starting from an empty history
+        self.salvage = True
+        self.skipped_records = 0
+        # Guards self.data against merges from the writer thread
+        self._data_lock = threading.RLock()
+        # Held while the snapshot is decoded, which takes seconds for a long
+        # history, so holders of _data_lock aren't kept waiting
+        self._decode_lock = threading.Lock()
+        # Serializes loading older partitions, which reads outside _data_lock
+        self._months_lock = threading.Lock()
+        # Cleared while load_data_async runs; data users wait on it
+        self._ready = threading.Event()
+        self._ready.set()
+        self.last_load_seconds = None
+        # Memory-mapped snapshot of the data file; self.data is decoded from
+        # it on first use, so startup doesn't parse the whole history
+        self._snapshot = None
+        self._snapshot_loaded = False
         self.data = []
+        self._columns = None  # Columnar copy of self.data, built on first report
+        # Running day/week totals, built on first query and updated by saves
+        self._aggregates = None
+        self._history = None  # Browsing indexes, built when history is viewed
+        self._names = None  # Project/task autocomplete indexes, built on first use
+        self._warming = False  # A warm_up() thread is running
+        # Partitioned stores: months loaded at startup; older ones load on demand
+        self.eager_months = 3
+        self._loaded_months = None  # None means the whole history is loaded
         self.hourly_rate = 0.0  # Used to compute earnings when saving
-        self.load_data()
+        # summarize_history() folds entries older than this into day summaries
+        self.retention_days = 365
+        # Disk writes happen on this thread so saving never blocks the caller
+        self.writer = BackgroundWriter(error_callback=self._report_write_error)
+        # The running session is checkpointed to a small file this often
+        # (seconds; 0 turns it off), so a crash loses at most that much
+        self.checkpoint_interval = 30.0
+        self._checkpointed_mono = None
+        self._checkpoint_failed = False
+        self.checkpoint = SessionCheckpoint(checkpoint_path(self.data_file))
+        # Checkpoint writes happen on this thread, not under the clock
+        self.checkpoint_writer = CheckpointWriter()
+        # Session a crash interrupted last time, if any; see recovered_session
+        self.recovered_session = self.checkpoint.read()
 
         # Callbacks for GUI updates
         self.update_time_callback = None
         self.update_status_callback = None
         self.show_warning_callback = None
         self.show_error_callback = None
+        self.data_changed_callback = None
+
+        # Headless tools that only append (e.g. the CLI) skip the initial load
+        if autoload:
+            self.load_data()
+
+    @property
+    def data(self):
+        """The loaded entries, decoded from the snapshot on first access."""
+        self._ready.wait()
+        if self._data is None:
+            with self._decode_lock:
+                snapshot = self._snapshot
+                if self._data is None and snapshot is not None:
+                    self._data = snapshot.entries()
+            with self._data_lock:
+                # Readers of the snapshot hold _data_lock
+                if self._data is not None:
+                    self._close_snapshot()
+        return self._data
+
+    @data.setter
+    def data(self, entries):
+        self._close_snapshot()
+        self._data = entries
+
+    def _close_snapshot(self):
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
 
     def set_callbacks(
-        self, update_time_cb, update_status_cb, show_warning_cb, show_error_cb
+        self,
+        update_time_cb,
+        update_status_cb,
+        show_warning_cb,
+        show_error_cb,
+        data_changed_cb=None,
     ):
-        self.update_time_callback = update_time_cb
-        self.update_status_callback = update_status_cb
+        self.update_time_callback = self._timed_callback("update_time", update_time_cb)
+        self.update_status_callback = self._timed_callback(
+            "update_status", update_status_cb
+        )
         self.show_warning_callback = show_warning_cb
         self.show_error_callback = show_error_cb
+        self.data_changed_callback = self._timed_callback(
+            "data_changed", data_changed_cb
+        )
+
+    @staticmethod
+    def _timed_callback(name, callback):
+        """Wrap a callback so its dispatch time is recorded when metrics are on."""
+        if callback is None:
+            return None
+        name = f"callback.{name}"
+
+        def dispatch(*args):
+            with metrics.timed(name):
+                return callback(*args)
+
+        return dispatch
 
     def start_timer(self, task_name, project_name):
         if not task_name.strip():
@@ -43,111 +178,344 @@ class TimeTrackerLogic:
             return
 
         if not self.is_running:
-            self.is_running = True
-            self.is_paused = False
-            self.start_time = datetime.now()
-            self.session_start_timestamp = (
-                datetime.now()
-            )  # Capture the actual start of the session
-            self.total_paused_time = (
-                timedelta()
-            )  # Reset total paused time for a new session
+            with self._clock:
+                now = time.monotonic()
+                self.is_running = True
+                self.is_paused = False
+                self.start_time = datetime.now()
+                # Capture the actual start of the session
+                self.session_start_timestamp = self.start_time
+                self._session_start_mono = now
+                self._segment_start_mono = now
+                self.elapsed_time = timedelta()
+                # Reset total paused time for a new session
+                self.total_paused_time = timedelta()
+                self._shown_second = 0
+                self._session_names = (task_name.strip(), project_name.strip())
+                self._checkpointed_mono = None
+                self._write_checkpoint()
+                self._ensure_scheduler()
+                self._clock.notify_all()
 
             status_text = f"Tracking: {task_name}"
             if project_name:
                 status_text += f" (Project: {project_name})"
             if self.update_status_callback:
                 self.update_status_callback(status_text)
-
-            self.timer_thread = threading.Thread(
-                target=self._update_timer_loop, daemon=True
-            )
-            self.timer_thread.start()
         elif self.is_paused:
-            self.is_paused = False
-            # When resuming, start a new active segment from now; accumulated time stays in self.elapsed_time
-            self.start_time = datetime.now()
+            with self._clock:
+                now = time.monotonic()
+                self.is_paused = False
+                # The pause ends now; its length is arithmetic on the monotonic clock
+                self.total_paused_time += timedelta(
+                    seconds=now - self._pause_start_mono
+                )
+                self._pause_start_mono = None
+                # Start a new active segment; accumulated time stays in elapsed_time
+                self.start_time = datetime.now()
+                self._segment_start_mono = now
+                self._write_checkpoint()
+                self._clock.notify_all()
             if self.update_status_callback:
                 self.update_status_callback("Resumed tracking")
 
     def pause_timer(self):
         if self.is_running and not self.is_paused:
-            self.is_paused = True
-            pause_start_time = datetime.now()  # Capture when pause started
-            # Accumulate time tracked in this active segment into total elapsed_time
-            self.elapsed_time += pause_start_time - self.start_time
-
-            # Start a new thread to track pause duration
-            def track_pause():
-                while self.is_paused:
-                    time.sleep(0.1)
-                # When unpaused, add the duration of this specific pause to total_paused_time
-                self.total_paused_time += datetime.now() - pause_start_time
-
-            threading.Thread(target=track_pause, daemon=True).start()
+            with self._clock:
+                now = time.monotonic()
+                self.is_paused = True
+                self._pause_start_mono = now
+                # Accumulate time tracked in this active segment into total elapsed_time
+                self.elapsed_time += timedelta(seconds=now - self._segment_start_mono)
+                self._segment_start_mono = None
+                self._write_checkpoint()
+                self._clock.notify_all()
 
             if self.update_status_callback:
                 self.update_status_callback("Timer paused")
 
     def stop_timer(self, task_name, project_name):
         if self.is_running:
-            end_timestamp = datetime.now()  # Capture the end time
+            with self._clock:
+                now = time.monotonic()
+                end_timestamp = datetime.now()  # Capture the end time
 
-            if self.is_paused:
-                final_tracked_duration = self.elapsed_time
-            else:
-                # Include accumulated elapsed_time plus the current running segment
-                final_tracked_duration = self.elapsed_time + (
-                    end_timestamp - self.start_time
+                # Include accumulated elapsed_time plus any running segment
+                final_tracked_duration = self.current_elapsed()
+
+                # Total session duration (tracked plus paused), monotonic clock
+                total_session_duration = timedelta(
+                    seconds=now - self._session_start_mono
                 )
+                # Derive total break duration deterministically
+                computed_break_duration = max(
+                    timedelta(), total_session_duration - final_tracked_duration
+                )
+                session_start_timestamp = self.session_start_timestamp
+                session = session_start_timestamp.timestamp()
 
-            # Calculate total session duration (including tracked time and paused time)
-            total_session_duration = end_timestamp - self.session_start_timestamp
-            # Derive total break duration deterministically
-            computed_break_duration = max(
-                timedelta(), total_session_duration - final_tracked_duration
-            )
+                self.is_running = False
+                self.is_paused = False
+                self.elapsed_time = timedelta()
+                self.start_time = None
+                self.session_start_timestamp = None  # Reset session start
+                self.total_paused_time = timedelta()  # Reset total paused time
+                self._session_start_mono = None
+                self._segment_start_mono = None
+                self._pause_start_mono = None
+                self._clock.notify_all()
 
             self.save_time_entry(
                 task_name,
                 project_name,
                 final_tracked_duration,
-                self.session_start_timestamp,
+                session_start_timestamp,
                 end_timestamp,
                 computed_break_duration,
+                # The checkpoint goes only once the entry is safely on disk
+                on_written=lambda: self._clear_checkpoint(session),
             )
 
-            self.is_running = False
-            self.is_paused = False
-            self.elapsed_time = timedelta()
-            self.start_time = None
-            self.session_start_timestamp = None  # Reset session start
-            self.total_paused_time = timedelta()  # Reset total paused time
-
             if self.update_time_callback:
                 self.update_time_callback("00:00:00")
             if self.update_status_callback:
                 self.update_status_callback("Time entry saved")
 
-    def _update_timer_loop(self):
-        while self.is_running:
-            if not self.is_paused:
-                current_elapsed = datetime.now() - self.start_time + self.elapsed_time
-                hours, remainder = divmod(int(current_elapsed.total_seconds()), 3600)
-                minutes, seconds = divmod(remainder, 60)
-                time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-                if self.update_time_callback:
-                    self.update_time_callback(time_str)
-            time.sleep(0.1)
-
-    def load_data(self):
+    def current_elapsed(self):
+        """Tracked (non-paused) time of the current session as a timedelta."""
+        with self._clock:
+            if not self.is_running:
+                return timedelta()
+            if self.is_paused:
+                return self.elapsed_time
+            return self.elapsed_time + timedelta(
+                seconds=time.monotonic() - self._segment_start_mono
+            )
+
+    @staticmethod
+    def format_elapsed(total_seconds):
+        hours, remainder = divmod(int(total_seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+    def _ensure_scheduler(self):
+        # One long-lived thread serves every session, pause and resume
+        if self.timer_thread is None or not self.timer_thread.is_alive():
+            self.timer_thread = threading.Thread(
+                target=self._scheduler_loop, name="time-tracker-clock", daemon=True
+            )
+            self.timer_thread.start()
+
+    def _scheduler_loop(self):
+        """Emit the display time once per whole tracked second.
+
+        Sleeps until the next second boundary while running, and indefinitely
+        while paused or stopped; state changes wake it through self._clock.
+        update_time_callback runs with the clock held, so it must not block.
+        """
+        with self._clock:
+            while not self._closed:
+                if not self.is_running or self.is_paused:
+                    self._clock.wait()
+                    continue
+                elapsed = self.current_elapsed().total_seconds()
+                second = int(elapsed)
+                if second != self._shown_second:
+                    self._shown_second = second
+                    metrics.count("timer.ticks")
+                    # How far past the second boundary the tick fired
+                    metrics.observe("timer.tick_lag", elapsed - second)
+                    if self.update_time_callback:
+                        self.update_time_callback(self.format_elapsed(second))
+                # None: checkpointing was off when the session started
+                if self.checkpoint_interval > 0 and (
+                    self._checkpointed_mono is None
+                    or time.monotonic() - self._checkpointed_mono
+                    >= self.checkpoint_interval
+                ):
+                    self._write_checkpoint()
+                self._clock.wait(second + 1 - elapsed)
+
+    def _write_checkpoint(self):
+        """Queue the running session for the checkpoint file; hold the clock."""
+        if self.checkpoint_interval <= 0 or not self.is_running:
+            return
+        now = time.monotonic()
+        self._checkpointed_mono = now
+        paused = self.total_paused_time.total_seconds()
+        if self.is_paused:
+            paused += now - self._pause_start_mono
+        task, project = self._session_names
+        checkpoint = self.checkpoint
+        record = (
+            PAUSED if self.is_paused else RUNNING,
+            self.session_start_timestamp.timestamp(),
+            self.current_elapsed().total_seconds(),
+            paused,
+            task,
+            project,
+            time.time(),
+        )
+
+        def write():
+            try:
+                with metrics.timed("checkpoint.write"):
+                    checkpoint.write(*record)
+            except OSError as e:
+                # Reported once; retried at the next interval
+                if not self._checkpoint_failed:
+                    self._checkpoint_failed = True
+                    self._report_write_error(
+                        "Error", f"Could not checkpoint the session: {e}"
+                    )
+            else:
+                self._checkpoint_failed = False
+
+        self.checkpoint_writer.submit(write, replace=True)
+
+    def _clear_checkpoint(self, session):
+        checkpoint = self.checkpoint
+
+        def clear():
+            try:
+                checkpoint.clear(session)
+            except OSError as e:
+                self._report_write_error(
+                    "Error", f"Could not clear the checkpoint: {e}"
+                )
+
+        self.checkpoint_writer.submit(clear)
+
+    def resume_recovered(self):
+        """Continue recovered_session as if it had not been interrupted.
+
+        The time since its last checkpoint counts as break. Returns False
+        if there is nothing to resume or another session is running.
+        """
+        info = self.recovered_session
+        if info is None or self.is_running:
+            return False
+        with self._clock:
+            now = time.monotonic()
+            since_start = max(0.0, time.time() - info["session_start"])
+            self.recovered_session = None
+            self.is_running = True
+            self.is_paused = info["state"] == PAUSED
+            self.start_time = datetime.now()
+            self.session_start_timestamp = datetime.fromtimestamp(
+                info["session_start"]
+            )
+            self._session_start_mono = now - since_start
+            self.elapsed_time = timedelta(seconds=info["tracked"])
+            self.total_paused_time = timedelta(
+                seconds=max(0.0, since_start - info["tracked"])
+            )
+            if self.is_paused:
+                self._segment_start_mono = None
+                self._pause_start_mono = now
+            else:
+                self._segment_start_mono = now
+            self._shown_second = None
+            self._session_names = (info["task"], info["project"])
+            self._checkpointed_mono = None
+            self._write_checkpoint()
+            self._ensure_scheduler()
+            self._clock.notify_all()
+        if self.update_status_callback:
+            self.update_status_callback(f"Resumed tracking: {info['task']}")
+        return True
+
+    def save_recovered(self):
+        """Save recovered_session as an entry ending at its last checkpoint."""
+        info = self.recovered_session
+        if info is None:
+            return False
+        self.recovered_session = None
+        start = datetime.fromtimestamp(info["session_start"])
+        end = datetime.fromtimestamp(max(info["written_at"], info["session_start"]))
+        tracked = timedelta(seconds=info["tracked"])
+        self.save_time_entry(
+            info["task"],
+            info["project"],
+            tracked,
+            start,
+            end,
+            max(timedelta(), end - start - tracked),
+            on_written=lambda: self._clear_checkpoint(info["session_start"]),
+        )
+        return True
+
+    def discard_recovered(self):
+        info = self.recovered_session
+        if info is not None:
+            self.recovered_session = None
+            self._clear_checkpoint(info["session_start"])
+
+    def load_data_async(self, on_done=None):
+        """Run load_data on a background thread, so a window can show first.
+
+        Until it finishes, reading self.data, saving and switching files
+        wait for it. on_done is called from the loader thread afterwards.
+        """
+        self._ready.clear()
+
+        def run():
+            try:
+                self.load_data()
+            finally:
+                self._ready.set()
+            if on_done:
+                on_done()
+
+        threading.Thread(target=run, name="time-tracker-loader", daemon=True).start()
+
+    def load_data(self, salvage=None):
+        """Read the data file into self.data.
+
+        If it can't be parsed, salvage mode (self.salvage unless given)
+        loads the records that pass the integrity check and reports how
+        many it skipped; without it the history starts out empty.
+        """
+        # Make sure entries still queued for writing are part of what we read
+        self.writer.flush()
+        started = time.perf_counter()
+        self.skipped_records = 0
+        self._columns = None
+        self._aggregates = None
+        self._history = None
+        self._names = None
+        self._loaded_months = None
+        self._snapshot_loaded = False
+        self.reload_needed = False
+        with self._decode_lock:
+            self._close_snapshot()
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, "r") as f:
-                    self.data = json.load(f)
+            if self.storage.kind in SNAPSHOT_KINDS:
+                snapshot = self._open_snapshot()
+                if snapshot is not None:
+                    self._data = None
+                    self._snapshot = snapshot
+                    self._snapshot_loaded = True
+                    self.shared.follow(
+                        snapshot.source_offset,
+                        snapshot.source_inode,
+                        snapshot.source_size,
+                        snapshot.source_mtime_ns,
+                    )
+                    return
+            if self.shared is not None:
+                self.data = entries_from_dicts(self.shared.load())
+            elif self.storage.partitioned:
+                months = [m for m in self.storage.months() if m != UNDATED]
+                recent = months[-self.eager_months :] if self.eager_months else []
+                self.data = entries_from_dicts(self.storage.load_months(recent))
+                self._loaded_months = set(recent)
             else:
-                self.data = []
+                self.data = entries_from_dicts(self.storage.load())
         except Exception as e:
+            if self.salvage if salvage is None else salvage:
+                if self._salvage_data(e):
+                    return
             # Fallback to empty data on error, and surface to UI if possible
             if self.show_error_callback:
                 self.show_error_callback(
@@ -156,12 +524,181 @@ class TimeTrackerLogic:
             else:
                 print(f"Error loading data: {e}")
             self.data = []
+        finally:
+            self.last_load_seconds = time.perf_counter() - started
+            metrics.observe("load_data", self.last_load_seconds)
+
+    def _salvage_data(self, error):
+        """Load every record that passes the integrity check; False on failure.
 
-    def set_data_file(self, new_path: str):
+        The damaged records stay in the data file. Other writers' appends
+        aren't merged until it is repaired (cli.py check --repair) and reloaded.
+        """
+        first = None
+
+        def good():
+            nonlocal first
+            for name, offset, entry, problem in scan_records(self.data_file):
+                if problem is None:
+                    yield entry
+                    continue
+                self.skipped_records += 1
+                if first is None:
+                    first = f"{os.path.basename(name)} at byte {offset}: {problem}"
+
+        try:
+            self.data = entries_from_dicts(list(good()))
+        except Exception as e:
+            print(f"Could not salvage {self.data_file}: {e}")
+            self.skipped_records = 0
+            return False
+        self._loaded_months = None
+        message = f"{self.data_file} could not be read ({error}). "
+        if first is None:
+            message += f"Loaded all {len(self._data)} entries record by record."
+        else:
+            message += (
+                f"Loaded {len(self._data)} entries and skipped "
+                f"{self.skipped_records} damaged records (the first in {first}). "
+                "They are left in the file; `cli.py check --repair NEW_FILE` "
+                "writes a clean copy."
+            )
+        if self.show_warning_callback:
+            self.show_warning_callback("Damaged data file", message)
+        else:
+            print(f"Warning: {message}")
+        return True
+
+    def _open_shared(self):
+        if not hasattr(self.storage, "tail"):
+            return None  # SQLite does its own locking
+        return SharedDataFile(
+            self.storage,
+            on_entries=self._merge_external,
+            on_rewrite=self._external_rewrite,
+        )
+
+    def _write_target(self):
+        """Where saves go: through the read-merge-append protocol if possible."""
+        return self.shared or self.storage
+
+    def _merge_external(self, entries):
+        """Add entries other programs appended to the data file."""
+        entries = entries_from_dicts(entries)
+        with self._data_lock:
+            self.data.extend(entries)
+            self._columns = None
+            if self._aggregates is not None:
+                for entry in entries:
+                    self._aggregates.add(entry)
+            self._index_names(entries)
+
+    def _external_rewrite(self):
+        self.reload_needed = True
+
+    def poll_changes(self):
+        """Pick up changes other programs made to the data file.
+
+        Costs one stat when nothing changed. Appends are merged by parsing
+        only the new tail; a rewritten file is reloaded in full on a
+        background thread (see load_data_async). Calls
+        data_changed_callback("appended"), or ("rewritten") once the reload
+        is done, and returns the change, or None. Call it from the thread
+        that uses the data, every watch_interval seconds: the interval
+        resets after a change and doubles up to WATCH_MAX_INTERVAL while
+        the file is idle.
+        """
+        change = None
+        if self.shared is not None and self._ready.is_set():
+            if self.reload_needed or self.shared.rewritten():
+                change = "rewritten"
+            elif self.shared.changed():
+                entries = self.shared.read_new()
+                if entries is None:
+                    change = "rewritten"
+                elif entries:
+                    change = "appended"
+        if change:
+            self.watch_interval = self.WATCH_MIN_INTERVAL
+        else:
+            self.watch_interval = min(
+                self.watch_interval * 2, self.WATCH_MAX_INTERVAL
+            )
+        if change == "rewritten":
+            self.load_data_async(on_done=lambda: self._data_changed("rewritten"))
+        elif change:
+            self._data_changed(change)
+        return change
+
+    def _data_changed(self, change):
+        if self.data_changed_callback:
+            self.data_changed_callback(change)
+
+    def _open_snapshot(self):
+        try:
+            return load_snapshot(self.storage)
+        except Exception as e:
+            # Only a cache: fall back to parsing the data file
+            print(f"Snapshot unavailable, reading {self.data_file}: {e}")
+            return None
+
+    def ensure_loaded(self, date_from=None, date_to=None):
+        """Load the partitions covering an inclusive date range into self.data.
+
+        Only does work for partitioned stores, and only for months that are
+        not in memory yet. With no bounds the whole history is loaded.
+        """
+        loaded = self._loaded_months
+        if loaded is None:
+            return
+        months = self.storage.months_between(date_from, date_to)
+        self._load_months([m for m in months if m not in loaded])
+        if date_from is None and date_to is None:
+            with self._months_lock:
+                self._loaded_months = None
+
+    def _load_months(self, months):
+        """Load older partitions into self.data; safe from any thread.
+
+        The shards are read without holding _data_lock, so saves aren't held
+        up; only the swap into self.data takes it.
+        """
+        if not months:
+            return
+        # Saves still in the writer queue are already in self.data
+        self.writer.flush()
+        with self._months_lock:
+            if self._loaded_months is None:
+                return
+            months = [m for m in months if m not in self._loaded_months]
+            if not months:
+                return  # Loaded by another thread meanwhile
+            try:
+                older = entries_from_dicts(self.storage.load_months(months))
+            except Exception as e:
+                if self.show_error_callback:
+                    self.show_error_callback(
+                        "Error", f"Could not load data from {self.data_file}: {e}"
+                    )
+                else:
+                    print(f"Error loading data: {e}")
+                return
+            with self._data_lock:
+                self.data = older + self.data
+                self._loaded_months.update(months)
+                self._columns = None
+                self._aggregates = None
+                self._names = None
+
+    def set_data_file(self, new_path: str, load=True):
         """Update the path to the data file and reload data from it.
 
         Expands '~' and environment variables. Does not create the file.
+        A directory (or a path ending in a separator) selects the
+        month-partitioned layout. With load=False the caller loads later
+        (e.g. with load_data_async).
         """
+        self._ready.wait()
         if not new_path:
             if self.show_warning_callback:
                 self.show_warning_callback(
@@ -170,9 +707,95 @@ class TimeTrackerLogic:
             return
         expanded = os.path.expandvars(os.path.expanduser(new_path))
         self.data_file = expanded
+        self.writer.flush()
+        self.storage.close()
+        self.storage = open_storage(expanded)
+        self.shared = self._open_shared()
+        # The running session (if any) moves to the new file's checkpoint
+        with self._clock:
+            previous = self.checkpoint
+            if self.is_running:
+                self._clear_checkpoint(self.session_start_timestamp.timestamp())
+            self.checkpoint = SessionCheckpoint(checkpoint_path(expanded))
+            if self.is_running:
+                self._write_checkpoint()
+            else:
+                self.recovered_session = self.checkpoint.read()
+        # Writes queued for the old file go out before it is closed
+        self.checkpoint_writer.flush()
+        previous.close()
         # Attempt to load any existing data from the new location
+        if load:
+            self.load_data()
+
+    def convert_data_file(self, new_path: str):
+        """Migrate the current history into new_path and switch to it.
+
+        The format is chosen from the extension (".jsonl" for the append-only
+        journal). The old file is kept as a backup. Returns True on success.
+        """
+        expanded = os.path.expandvars(os.path.expanduser(new_path))
+        self.writer.flush()
+        try:
+            count = convert_data_file(self.data_file, expanded)
+        except Exception as e:
+            if self.show_error_callback:
+                self.show_error_callback("Error", f"Could not convert data: {e}")
+            else:
+                print(f"Error: Could not convert data: {e}")
+            return False
+        self.set_data_file(expanded)
+        if self.update_status_callback:
+            self.update_status_callback(f"Converted {count} entries")
+        return True
+
+    def compact_data_file(self):
+        """Rewrite a journal or partitioned store, dropping blank or torn lines.
+
+        Partitioned stores also get misplaced entries moved to the right
+        month and each shard sorted.
+        """
+        if not hasattr(self.storage, "compact"):
+            return
+        self._ready.wait()
+        self.writer.flush()
+        try:
+            self.storage.compact()
+        except Exception as e:
+            if self.show_error_callback:
+                self.show_error_callback("Error", f"Could not compact data: {e}")
+            else:
+                print(f"Error: Could not compact data: {e}")
+            return
         self.load_data()
 
+    def summarize_history(self, older_than_days=None, archive=True):
+        """Fold entries older than a number of days into day summaries.
+
+        Defaults to retention_days. Each (day, project) becomes one record
+        with the summed duration, break time and earnings, which reports
+        count like the entries it replaces. With archive the raw entries
+        are first appended to "<data file>.archive.jsonl.gz". Returns
+        summarize_before's counts, or None on failure.
+        """
+        days = self.retention_days if older_than_days is None else older_than_days
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        self._ready.wait()
+        self.writer.flush()
+        try:
+            stats = summarize_before(
+                self.storage, cutoff, archive_path(self.data_file) if archive else None
+            )
+        except Exception as e:
+            if self.show_error_callback:
+                self.show_error_callback("Error", f"Could not summarize history: {e}")
+            else:
+                print(f"Error: Could not summarize history: {e}")
+            return None
+        if stats["folded"]:
+            self.load_data()
+        return stats
+
     def set_hourly_rate(self, rate: float):
         """Set the hourly rate used when computing earnings on save."""
         try:
@@ -184,8 +807,18 @@ class TimeTrackerLogic:
             self.hourly_rate = 0.0
 
     def save_time_entry(
-        self, task_name, project_name, duration, start_ts, end_ts, break_duration
+        self,
+        task_name,
+        project_name,
+        duration,
+        start_ts,
+        end_ts,
+        break_duration,
+        on_written=None,
     ):
+        """Append an entry; on_written runs on the writer thread once it's on disk."""
+        started = time.perf_counter()
+        self._ready.wait()
         task_name = task_name.strip()
         project_name = project_name.strip()
 
@@ -194,35 +827,402 @@ class TimeTrackerLogic:
         # Compute earnings (based on working/active time only)
         earnings = round((duration_seconds / 3600.0) * float(self.hourly_rate), 4)
 
-        entry = {
-            "task": task_name,
-            "project": project_name,
-            "duration_seconds": duration_seconds,
-            "break_seconds": break_seconds,  # New: break time
-            "start_time": start_ts.isoformat(),  # New: start timestamp
-            "end_time": end_ts.isoformat(),  # New: end timestamp
-            "earnings": earnings,  # New: computed earnings
-            "date": datetime.now().strftime("%Y-%m-%d"),
-        }
+        entry = TimeEntry(
+            task=task_name,
+            project=project_name,
+            duration_seconds=duration_seconds,
+            break_seconds=break_seconds,
+            start_time=start_ts.isoformat(),
+            end_time=end_ts.isoformat(),
+            earnings=earnings,  # Computed from the hourly rate
+            # The day the session ended (today, unless it was recovered)
+            date=end_ts.strftime("%Y-%m-%d"),
+        )
 
-        self.data.append(entry)
+        if self._loaded_months is not None:
+            # Load the rest of the entry's month first so it isn't read twice
+            month = month_of(entry)
+            if month not in self._loaded_months:
+                self._load_months([month])
 
+        # In-memory data is updated right away; the writer thread persists
+        # the entry and reports failures through show_error_callback
+        with self._data_lock:
+            self.data.append(entry)
+            if self._columns is not None:
+                self._columns.append(entry)
+            if self._aggregates is not None:
+                self._aggregates.add(entry)
+            self._index_names((entry,))
+        self.writer.submit(self._write_target(), entry, on_written)
+        # Caller-side latency; the write itself is timed on the writer thread
+        metrics.observe("save_time_entry", time.perf_counter() - started)
+
+    def _report_write_error(self, title, message):
+        if self.show_error_callback:
+            self.show_error_callback(title, message)
+        else:
+            print(f"Error: {message}")
+
+    def close(self):
+        """Flush pending writes and release the data file. Call on exit."""
+        with self._clock:
+            self._closed = True
+            self._clock.notify_all()
+        self.writer.close()
+        # After the writer, whose saves may clear the checkpoint
+        self.checkpoint_writer.close()
+        # A session still running keeps its checkpoint for the next start
+        self.checkpoint.close()
+        self._close_snapshot()
+        if self._snapshot_loaded:
+            # Fold this session's saves into the snapshot for the next start
+            snapshot = self._open_snapshot()
+            if snapshot is not None:
+                snapshot.close()
+        self.storage.close()
+
+    def get_unique_projects(self):
+        """Returns a sorted list of unique project names from the loaded data.
+
+        For partitioned stores that is the recently used projects only.
+        """
+        with metrics.timed("get_unique_projects"):
+            return self._unique_projects()
+
+    def _unique_projects(self):
+        self._ready.wait()
+        with self._data_lock:
+            if self._data is None:
+                projects = {name.strip() for name in self._snapshot.projects()}
+                projects.discard("")
+                return sorted(projects)
+        if self.storage.indexed:
+            try:
+                return self.storage.unique_projects()
+            except Exception as e:
+                print(f"Index lookup failed, scanning entries: {e}")
+        return sorted(self._name_indexes()["project"].names())
+
+    def get_entries(self, project=None, date_from=None, date_to=None):
+        """Entries for a project and/or inclusive "YYYY-MM-DD" date range.
+
+        Uses the backend's indexes when it has them, otherwise filters the
+        loaded data.
+        """
+        if self.storage.indexed:
+            try:
+                return entries_from_dicts(
+                    self.storage.query(project, date_from, date_to)
+                )
+            except Exception as e:
+                print(f"Index lookup failed, scanning entries: {e}")
+        self.ensure_loaded(date_from, date_to)
+        return [
+            entry
+            for entry in self.data
+            if (project is None or entry.get("project") == project)
+            and (date_from is None or entry.get("date", "") >= date_from)
+            and (date_to is None or entry.get("date", "") <= date_to)
+        ]
+
+    def import_data_file(self, path: str):
+        """Append all entries from another data file (e.g. an exported JSON file).
+
+        Returns the number of imported entries, or None on failure.
+        """
+        self._ready.wait()
+        source = open_storage(os.path.expandvars(os.path.expanduser(path)))
+        self.writer.flush()
         try:
-            # Ensure target directory exists
-            target_dir = os.path.dirname(os.path.abspath(self.data_file)) or "."
-            os.makedirs(target_dir, exist_ok=True)
-            with open(self.data_file, "w") as f:
-                json.dump(self.data, f, indent=2)
+            entries = entries_from_dicts(source.load())
+            self._write_target().append_many(entries)
         except Exception as e:
             if self.show_error_callback:
-                self.show_error_callback("Error", f"Could not save data: {e}")
+                self.show_error_callback("Error", f"Could not import data: {e}")
             else:
-                print(f"Error: Could not save data: {e}")
+                print(f"Error: Could not import data: {e}")
+            return None
+        finally:
+            source.close()
+        if self._loaded_months is not None:
+            # Imported entries may belong to months that aren't loaded yet
+            self.load_data()
+            return len(entries)
+        with self._data_lock:
+            self.data.extend(entries)
+            if self._columns is not None:
+                self._columns.extend(entries)
+            if self._aggregates is not None:
+                for entry in entries:
+                    self._aggregates.add(entry)
+            self._index_names(entries)
+        return len(entries)
 
-    def get_unique_projects(self):
-        """Returns a sorted list of unique project names from the loaded data."""
-        projects = set()
-        for entry in self.data:
-            if "project" in entry and entry["project"].strip():
-                projects.add(entry["project"].strip())
-        return sorted(list(projects))
+    def export_data_file(self, path: str):
+        """Write the whole history to path; the format follows its extension.
+
+        Returns the number of exported entries, or None on failure.
+        """
+        self.writer.flush()
+        try:
+            # Streamed from the store, which also covers unloaded partitions
+            return convert_data_file(
+                self.data_file, os.path.expandvars(os.path.expanduser(path))
+            )
+        except Exception as e:
+            if self.show_error_callback:
+                self.show_error_callback("Error", f"Could not export data: {e}")
+            else:
+                print(f"Error: Could not export data: {e}")
+            return None
+
+    def columns(self):
+        """Columnar view of the loaded history, kept in step with saves.
+
+        Saves append to it under _data_lock: read it under the lock, or
+        copy() it there and read the copy.
+        """
+        # Imported here: it pulls in NumPy, which startup doesn't need
+        from columnar import EntryColumns
+
+        return self._build_unlocked(
+            "_columns",
+            lambda data, count: EntryColumns.from_entries(islice(data, count)),
+            EntryColumns.extend,
+        )
+
+    def report(self, by="project", date_from=None, date_to=None):
+        """Grouped totals of duration, break time and earnings.
+
+        by is "project", "task", "date", "week" (ISO) or "month", or a tuple
+        of them such as ("project", "week"). Dates are inclusive "YYYY-MM-DD"
+        strings. See EntryColumns.totals for the result layout.
+        """
+        self.ensure_loaded(date_from, date_to)
+        columns = self.columns()
+        # Control API reads run off the Tk thread. Saves append to the
+        # columns, so the totals are computed from a copy, outside the lock
+        with self._data_lock:
+            columns = (self._columns or columns).copy()
+        return columns.totals(by, date_from, date_to)
+
+    def _build_unlocked(self, name, build, catch_up):
+        """Return the cache of self.data in attribute name, building it if unset.
+
+        build(data, count) builds it over data[:count], the entries present
+        when it starts, without holding _data_lock, so saves and lookups go
+        on meanwhile (the list only grows at the end). catch_up(cache,
+        entries) then adds the ones appended since, under the lock. If the
+        data was reloaded meanwhile, the cache is built again over the new
+        list. Call it without holding _data_lock.
+        """
+        while True:
+            data = self.data
+            with self._data_lock:
+                cache = getattr(self, name)
+                if cache is not None:
+                    return cache
+                if self._data is not data:
+                    continue  # Reloaded since
+                count = len(data)
+            cache = build(data, count)
+            with self._data_lock:
+                if getattr(self, name) is not None:
+                    return getattr(self, name)  # Built by another thread
+                if self._data is data:
+                    catch_up(cache, data[count:])
+                    setattr(self, name, cache)
+                    return cache
+
+    def aggregates(self):
+        """Running totals of the loaded history (see AggregateCache).
+
+        Built on first use and updated by every save and merge; reloads
+        discard it. Hold no reference across calls: use the query methods.
+        """
+
+        def build(data, count):
+            with metrics.timed("aggregates.build"):
+                return AggregateCache(islice(data, count))
+
+        def catch_up(aggregates, entries):
+            for entry in entries:
+                aggregates.add(entry)
+
+        return self._build_unlocked("_aggregates", build, catch_up)
+
+    def warm_up(self):
+        """Build the running totals and name indexes ahead of their first use.
+
+        Takes _data_lock only briefly, so it can run on a background thread
+        while the UI saves and looks things up.
+        """
+        self.aggregates()
+        self._name_indexes()
+
+    def _warm_async(self):
+        # One warm-up at a time; data_changed_callback("indexed") when done
+        with self._data_lock:
+            if self._warming:
+                return
+            self._warming = True
+
+        def run():
+            try:
+                self.warm_up()
+            finally:
+                self._warming = False
+            if self.data_changed_callback:
+                self.data_changed_callback("indexed")
+
+        threading.Thread(target=run, name="time-tracker-warm", daemon=True).start()
+
+    def totals(self, project=None, date_from=None, date_to=None):
+        """Totals for a project (None for all) over an inclusive date range.
+
+        Answered from the running per-day totals; recent ranges are cached.
+        """
+        self.ensure_loaded(date_from, date_to)
+        aggregates = self.aggregates()
+        with self._data_lock:
+            return aggregates.range(date_from, date_to, project)
+
+    def today_totals(self, project=None, wait=True):
+        """Totals of the entries dated today.
+
+        With wait=False this never builds the running totals: if they
+        aren't ready it returns None and builds them on a background
+        thread, then calls data_changed_callback("indexed").
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        if wait:
+            self.ensure_loaded(today, today)
+            aggregates = self.aggregates()
+        else:
+            aggregates = self._aggregates if self._ready.is_set() else None
+            if aggregates is None:
+                if self._ready.is_set():
+                    self._warm_async()
+                return None
+        with self._data_lock:
+            return aggregates.day(today, project)
+
+    def week_totals(self, project=None):
+        """Totals of the current ISO week."""
+        now = datetime.now()
+        year, week, weekday = now.isocalendar()
+        monday = (now - timedelta(days=weekday - 1)).strftime("%Y-%m-%d")
+        self.ensure_loaded(monday, now.strftime("%Y-%m-%d"))
+        aggregates = self.aggregates()
+        with self._data_lock:
+            return aggregates.week(f"{year}-W{week:02d}", project)
+
+    def history(
+        self, project=None, date_from=None, date_to=None, sort="start", descending=True
+    ):
+        """A HistoryView of the entries for browsing, newest first by default.
+
+        Filters and sort columns are as for HistoryIndex.view. The indexes
+        are built on first use and extended with entries saved or merged
+        since, so repeated calls don't rescan the history.
+        """
+        # Loads partitions outside _data_lock; they are swapped in under it
+        self.ensure_loaded(date_from, date_to)
+        index = self._history_index()
+        with self._data_lock:
+            index.update()
+            return index.view(project, date_from, date_to, sort, descending)
+
+    def _history_index(self):
+        # Built without holding _data_lock; callers update() it under the lock
+        def build(data, count):
+            with metrics.timed("history.index"):
+                return HistoryIndex(data, count)
+
+        while True:
+            index = self._build_unlocked(
+                "_history", build, lambda index, entries: index.update()
+            )
+            with self._data_lock:
+                if index.entries is self._data:
+                    return index
+                # self.data was replaced, e.g. when older months were loaded
+                if self._history is index:
+                    self._history = None
+
+    def history_projects(self):
+        """Projects that appear in the browsable history."""
+        self.ensure_loaded()
+        index = self._history_index()
+        with self._data_lock:
+            index.update()
+            return index.projects()
+
+    def prepare_history_sort(self, column):
+        """Build the unfiltered history order by a column ahead of history().
+
+        Sorting a long history takes a while, so this is meant for a
+        background thread. The sort runs without holding _data_lock, so
+        saves carry on meanwhile.
+        """
+        self.ensure_loaded()
+        index = self._history_index()
+        with self._data_lock:
+            index.update()
+            if index.has_order(column):
+                return
+            rows, indexed = index.rows(), len(index)
+        with metrics.timed("history.sort"):
+            order = index.sort_rows(column, rows)
+        with self._data_lock:
+            # Dropped if the data was reloaded meanwhile
+            if self._history is index:
+                index.update()
+                index.add_order(column, order, indexed)
+
+    def _name_indexes(self):
+        def build(data, count):
+            with metrics.timed("names.index"):
+                names = {"project": NameIndex(), "task": NameIndex()}
+                self._add_names(names, islice(data, count))
+                return names
+
+        return self._build_unlocked("_names", build, self._add_names)
+
+    def _index_names(self, entries):
+        if self._names is not None:
+            self._add_names(self._names, entries)
+
+    @staticmethod
+    def _add_names(names, entries):
+        pairs = [
+            (entry.get("project"), entry.get("task"), entry.get("date"))
+            for entry in entries
+        ]
+        names["project"].add_many((project, day) for project, _, day in pairs)
+        names["task"].add_many((task, day) for _, task, day in pairs)
+
+    def _complete(self, kind, text, limit):
+        names = self._names if self._ready.is_set() else None
+        if names is None:
+            # Built in the background (see warm_up); typing never waits
+            if self._ready.is_set():
+                self._warm_async()
+            return []
+        with metrics.timed("complete"):
+            with self._data_lock:
+                return names[kind].complete(text, limit)
+
+    def complete_projects(self, text, limit=8):
+        """Project names matching text (prefix, then fuzzy), most used first.
+
+        Ranked by how often and how recently each was used; see NameIndex.
+        Empty while the data loads and the indexes are built, so typing
+        never waits for either.
+        """
+        return self._complete("project", text, limit)
+
+    def complete_tasks(self, text, limit=8):
+        """Task names matching text, ranked like complete_projects."""
+        return self._complete("task", text, limit)
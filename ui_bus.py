@@ -0,0 +1,163 @@
+import os
+import sys
+import threading
+import tkinter
+
+from instrumentation import metrics
+
+# Empty drains for this long before the interval starts backing off, so a
+# steady once-a-second post (the running clock) keeps the normal rate
+IDLE_AFTER_MS = 1000
+# Where Tk can't watch a pipe (Windows), posts from other threads wait for
+# the next drain, so the interval backs off no further than this
+NO_WAKEUP_MAX_INTERVAL_MS = 200
+
+
+class UiEventBus:
+    """Carries updates from any thread to the Tk thread, in batches.
+
+    post() and call() only append to in-memory buffers under a lock, so
+    they are safe and cheap from any thread. The Tk loop drains the
+    buffers every interval_ms and runs the handlers there, so widgets are
+    only ever touched from Tk's thread. Once nothing has been posted for
+    a while, the interval doubles on each empty drain up to
+    max_interval_ms, and drops back when events arrive. A post brings the
+    next drain forward at once: on the Tk thread directly, from another
+    thread by writing a byte to a pipe Tk watches. Without that pipe
+    (Windows), the interval backs off to NO_WAKEUP_MAX_INTERVAL_MS at most.
+
+    post(channel, *args) is last-value-wins: of the values posted to a
+    channel between two drains only the latest is delivered, to the
+    handler given to subscribe(). call(fn, *args) is never coalesced and
+    runs in order; use it for dialogs and one-off work.
+    """
+
+    def __init__(self, root, interval_ms=50, max_interval_ms=1000):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_interval_ms = max_interval_ms
+        self._delay = interval_ms  # Until the next drain; Tk thread only
+        self._idle_ms = 0
+        self._tk_thread = None
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._latest = {}  # channel -> args of the newest post
+        self._calls = []
+        self._job = None
+        self._wakeup = None  # (read fd, write fd) of the self-pipe
+
+    def subscribe(self, channel, handler):
+        self._handlers[channel] = handler
+
+    def post(self, channel, *args):
+        with self._lock:
+            was_empty = not self._calls and not self._latest
+            if self._latest.pop(channel, None) is not None:
+                metrics.count("bus.coalesced")
+            self._latest[channel] = args
+            self._signal(was_empty)
+        metrics.count("bus.posted")
+        self._wake()
+
+    def call(self, fn, *args):
+        with self._lock:
+            was_empty = not self._calls and not self._latest
+            self._calls.append((fn, args))
+            self._signal(was_empty)
+        metrics.count("bus.posted")
+        self._wake()
+
+    def start(self):
+        """Begin draining from the Tk loop; call on the Tk thread."""
+        self._tk_thread = threading.get_ident()
+        if self._wakeup is None:
+            if hasattr(self.root.tk, "createfilehandler"):
+                read_fd, write_fd = os.pipe()
+                os.set_blocking(read_fd, False)
+                os.set_blocking(write_fd, False)
+                self.root.tk.createfilehandler(
+                    read_fd, tkinter.READABLE, self._on_wakeup
+                )
+                self._wakeup = (read_fd, write_fd)
+            else:
+                self.max_interval_ms = min(
+                    self.max_interval_ms, NO_WAKEUP_MAX_INTERVAL_MS
+                )
+        if self._job is None:
+            self._delay = self.interval_ms
+            self._job = self.root.after(self._delay, self._tick)
+
+    def _signal(self, was_empty):
+        # Call with self._lock held. The first post since a drain from another
+        # thread writes one byte; later ones find the buffers non-empty
+        if (
+            was_empty
+            and self._wakeup is not None
+            and threading.get_ident() != self._tk_thread
+        ):
+            try:
+                os.write(self._wakeup[1], b"\0")
+            except OSError:
+                pass  # Pipe full: a wakeup is pending anyway
+
+    def _on_wakeup(self, fd, mask):
+        try:
+            os.read(fd, 4096)
+        except OSError:
+            pass
+        self._hurry()
+
+    def _wake(self):
+        # Only Tk's thread may reschedule; other threads go through the pipe
+        if threading.get_ident() == self._tk_thread:
+            self._hurry()
+
+    def _hurry(self):
+        # Bring a backed-off drain forward; call on the Tk thread
+        if self._delay > self.interval_ms and self._job is not None:
+            self.root.after_cancel(self._job)
+            self._delay = self.interval_ms
+            self._idle_ms = 0
+            self._job = self.root.after(self._delay, self._tick)
+
+    def close(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        with self._lock:
+            wakeup, self._wakeup = self._wakeup, None
+        if wakeup is not None:
+            self.root.tk.deletefilehandler(wakeup[0])
+            for fd in wakeup:
+                os.close(fd)
+
+    def _tick(self):
+        if self.drain():
+            self._delay = self.interval_ms
+            self._idle_ms = 0
+        else:
+            self._idle_ms += self._delay
+            if self._idle_ms >= IDLE_AFTER_MS:
+                self._delay = min(self._delay * 2, self.max_interval_ms)
+        self._job = self.root.after(self._delay, self._tick)
+
+    def drain(self):
+        """Deliver everything posted so far; returns the number of events."""
+        if not self._calls and not self._latest:
+            return 0  # Idle ticks skip the lock
+        with self._lock:
+            calls, self._calls = self._calls, []
+            latest, self._latest = self._latest, {}
+        with metrics.timed("bus.drain"):
+            for fn, args in calls:
+                self._run(fn, args)
+            for channel, args in latest.items():
+                self._run(self._handlers[channel], args)
+        return len(calls) + len(latest)
+
+    def _run(self, fn, args):
+        try:
+            fn(*args)
+        except Exception:
+            # Reported like an exception in any other Tk callback
+            self.root.report_callback_exception(*sys.exc_info())
@@ -0,0 +1,89 @@
+import queue
+import threading
+
+from instrumentation import metrics
+
+
+class BackgroundWriter:
+    """Persists saved entries on a dedicated thread.
+
+    Entries are queued with the storage they belong to. Whatever piles up
+    while a write is in flight goes out together as one append_many call
+    (group commit), so a burst of saves costs one write and one fsync.
+    The queue is bounded; submit() blocks once max_pending entries wait.
+    An optional on_written callback runs on the writer thread once the
+    entry is on disk.
+    """
+
+    def __init__(self, error_callback=None, max_pending=1000):
+        self.error_callback = error_callback
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="time-tracker-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, storage, entry, on_written=None):
+        with self._idle:
+            self._pending += 1
+        self._queue.put((storage, entry, on_written))
+
+    def flush(self, timeout=None):
+        """Wait until every submitted entry has been written (or failed).
+
+        Returns False if the timeout expired first.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+            if stop:
+                return
+
+    def _write(self, batch):
+        # Keep submission order; split wherever the target storage changes
+        start = 0
+        for i in range(1, len(batch) + 1):
+            if i == len(batch) or batch[i][0] is not batch[start][0]:
+                storage = batch[start][0]
+                metrics.count("writer.batches")
+                metrics.count("writer.entries", i - start)
+                try:
+                    with metrics.timed("writer.append_many"):
+                        storage.append_many([item[1] for item in batch[start:i]])
+                except Exception as e:
+                    if self.error_callback:
+                        self.error_callback("Error", f"Could not save data: {e}")
+                    else:
+                        print(f"Error: Could not save data: {e}")
+                else:
+                    for _, _, on_written in batch[start:i]:
+                        if on_written is not None:
+                            on_written()
+                start = i